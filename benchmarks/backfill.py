@@ -0,0 +1,90 @@
+"""Module used to measure the throughput of the historical backfill for a number of worker processes,
+on a synthetic dump file with the given percentage of comments from a served subreddit:
+
+    python -m benchmarks.backfill --comments 200000 --served-percent 1 --workers 1 2 4 8
+
+The speedup is reported relative to the first number of workers; the number of CPUs is saved
+with the results, as the speedup is bounded by it."""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from benchmarks import memory, run_benchmarks, synthetic_data
+import gwent_responses_backfill as backfill
+
+__author__ = 'Jonarzz'
+
+
+DEFAULT_COMMENTS = 200000
+DEFAULT_WORKERS = [1, 2, 4]
+DEFAULT_SERVED_PERCENT = 50
+RESPONSES = 10000
+
+
+def write_dump(filename, comments, served_percent=DEFAULT_SERVED_PERCENT):
+    """Method that writes a synthetic dump file with the given number of comments,
+    served_percent of them from a served subreddit."""
+    pairs = synthetic_data.responses(RESPONSES)
+    with open(filename, 'w', encoding='UTF-8') as file:
+        for number, comment in enumerate(synthetic_data.comment_stream(pairs, comments)):
+            served = number * served_percent // 100 != (number + 1) * served_percent // 100
+            comment["subreddit"] = 'gwent' if served else 'AskReddit'
+            file.write(json.dumps(comment) + '\n')
+
+
+def measure_workers(comments, workers_counts, served_percent=DEFAULT_SERVED_PERCENT):
+    """Method that runs the backfill over the synthetic dump with each number of workers
+    and returns the comments processed per second and the speedup over the first number of workers."""
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        responses_db = os.path.join(work_dir, 'responses.db')
+        source = memory.responses_connection(RESPONSES)
+        source.commit()
+        with sqlite3.connect(responses_db) as connection:
+            source.backup(connection)
+        games = {'gwent': {'wiki_url': '', 'category': '', 'responses_db': responses_db,
+                           'subreddits': ['gwent'], 'excluded_responses': []}}
+        dump = os.path.join(work_dir, 'dump.ndjson')
+        write_dump(dump, comments, served_percent)
+
+        baseline = None
+        for workers in workers_counts:
+            start = time.perf_counter()
+            with mock.patch('builtins.print'):
+                _, counters = backfill.backfill(dump, workers, os.path.join(work_dir, 'backfill.db'), games)
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            results[str(workers)] = {"seconds": seconds, "lines": counters['lines'],
+                                     "matched": counters['matched', 'gwent'],
+                                     "lines_per_second": counters['lines'] / seconds,
+                                     "speedup": baseline / seconds}
+            print("{:>3} workers {:>10.3f} s {:>12.0f} lines/s {:>6.2f}x".format(
+                workers, seconds, counters['lines'] / seconds, baseline / seconds))
+    return results
+
+
+def main(argv=None):
+    """Method that parses the command line arguments, measures the throughput and saves the results."""
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--comments', type=int, default=DEFAULT_COMMENTS)
+    argument_parser.add_argument('--served-percent', type=int, default=DEFAULT_SERVED_PERCENT)
+    argument_parser.add_argument('--workers', type=int, nargs='+', default=DEFAULT_WORKERS)
+    argument_parser.add_argument('--output', help='file to save the JSON results to')
+    args = argument_parser.parse_args(argv)
+
+    if max(args.workers) > (os.cpu_count() or 1):
+        print("Warning: more workers than the {} CPUs, the speedup is bounded by the CPUs".format(os.cpu_count()))
+    results = measure_workers(args.comments, args.workers, args.served_percent)
+    report = {"commit": run_benchmarks.current_commit(), "cpus": os.cpu_count(),
+              "served_percent": args.served_percent, "results": {"backfill": results}}
+    print("Results saved to " + run_benchmarks.save_results(report, args.output))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Module used to compare the memory used by the loaded responses catalog in the compact layout
+(slotted records, interned hero names, shared link prefixes) and in the plain layout
+(a tuple of fresh strings per response, as loaded before):
+
+    python -m benchmarks.memory --sizes 10000 100000
+
+Every measurement runs in a fresh interpreter, so the resident sizes are comparable."""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tracemalloc
+
+from benchmarks import run_benchmarks, synthetic_data
+from responses_bot import matcher
+
+__author__ = 'Jonarzz'
+
+
+LAYOUTS = ['plain', 'compact']
+DEFAULT_SIZES = [10000, 100000]
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_plain(cursor):
+    """Method that loads the responses as a dictionary of stripped response - (response, link, hero)
+    tuple, the layout used before the compact records."""
+    responses = {}
+    cursor.execute("SELECT stripped, response, link, hero FROM responses WHERE stripped IS NOT NULL")
+    for stripped, response, link, hero in cursor:
+        if stripped not in responses:
+            responses[stripped] = (response, link, hero)
+    return responses
+
+
+def responses_connection(size):
+    """Method that returns an in-memory responses database with size synthetic responses."""
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE responses (response text, link text, hero text, '
+                       'hero_id integer, stripped text)')
+    connection.executemany(
+        "INSERT INTO responses(response, link, hero, stripped) VALUES (?, ?, ?, ?)",
+        [(text.lower(), synthetic_data.MEDIA_URL.format(len(text) % 10, len(hero) % 10,
+                                                        (hero + '_-_' + text).replace(' ', '_')),
+          hero, matcher.stripped_response(text))
+         for hero, text in synthetic_data.responses(size)])
+    return connection
+
+
+def resident_size():
+    """Method that returns the resident set size of the process in bytes (None if unknown)."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def measure_layout(layout, size):
+    """Method that loads size responses in the given layout and returns the bytes allocated
+    by the loaded catalog (tracemalloc) and the growth of the resident size."""
+    cursor = responses_connection(size).cursor()
+    load = load_plain if layout == 'plain' else matcher.load_responses
+
+    rss_before = resident_size()
+    tracemalloc.start()
+    responses = load(cursor)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rss_after = resident_size()
+
+    return {"layout": layout, "size": size, "responses": len(responses),
+            "allocated_bytes": allocated,
+            "rss_growth_bytes": rss_after - rss_before if rss_before is not None else None}
+
+
+def measure_in_subprocess(layout, size):
+    """Method that runs measure_layout in a fresh interpreter and returns its results."""
+    output = subprocess.check_output([sys.executable, '-m', 'benchmarks.memory',
+                                      '--child', layout, str(size)],
+                                     cwd=REPO_DIR, universal_newlines=True)
+    return json.loads(output)
+
+
+def main(argv=None):
+    """Method that parses the command line arguments, measures the layouts and saves the results."""
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    argument_parser.add_argument('--output', help='file to save the JSON results to')
+    argument_parser.add_argument('--child', nargs=2, metavar=('LAYOUT', 'SIZE'),
+                                 help=argparse.SUPPRESS)
+    args = argument_parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure_layout(args.child[0], int(args.child[1]))))
+        return
+
+    results = {}
+    for size in args.sizes:
+        for layout in LAYOUTS:
+            result = measure_in_subprocess(layout, size)
+            results.setdefault(layout, {})[str(size)] = result
+            print("{:<8} {:>7} {:>10.1f} MB allocated {:>10.1f} MB resident".format(
+                layout, size, result["allocated_bytes"] / 2 ** 20,
+                (result["rss_growth_bytes"] or 0) / 2 ** 20))
+
+    report = {"commit": run_benchmarks.current_commit(), "results": {"memory": results}}
+    print("Results saved to " + run_benchmarks.save_results(report, args.output))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,367 @@
+# coding=UTF-8
+
+"""Module used to run the offline benchmark suite and save the results as JSON.
+
+Wiki pages, category listings and comments are generated by the synthetic_data module,
+so no network connection is needed and the results are comparable between commits:
+
+    python -m benchmarks.run_benchmarks --sizes 100 1000 10000
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<older>.json"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from benchmarks import synthetic_data
+from responses_bot import catalog, dedupe, intake, matcher, search
+from responses_wiki import dictionary_files
+from responses_wiki import gwent_wiki_parser as parser
+import gwent_responses_database as database
+import gwentresponses
+
+__author__ = 'Jonarzz'
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_REPEAT = 5
+
+
+def measure(function, repeat=DEFAULT_REPEAT, setup=None):
+    """Method that calls the given function repeat times (calling setup before each run,
+    outside of the measured time) and returns the best and median time in seconds."""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {"best": min(timings), "median": statistics.median(timings), "repeat": repeat}
+
+
+def bench_create_list_of_responses(size, repeat):
+    """Method that times parsing of a single wiki page with size "fullMedia" elements."""
+    page = synthetic_data.full_media_page(synthetic_data.responses(size))
+    with mock.patch.object(parser, 'page_to_parse', return_value=page):
+        return measure(lambda: parser.create_list_of_responses('Audio'), repeat)
+
+
+def bench_response_text_from_element(size, repeat):
+    """Method that times extracting the response text, link and hero name of size elements."""
+    elements = [synthetic_data.media_element(hero, text)
+                for hero, text in synthetic_data.responses(size)]
+
+    def run():
+        for element in elements:
+            parser.response_text_from_element(element)
+            parser.value_from_element(element)
+            parser.short_hero_name_from_url(element)
+
+    return measure(run, repeat)
+
+
+def bench_pages_for_category(size, repeat):
+    """Method that times walking a category of size members split into continued listings."""
+    titles = ['File:' + hero + ' - ' + text + '.mp3'
+              for hero, text in synthetic_data.responses(size)]
+    listings = synthetic_data.category_listings(titles)
+
+    def run():
+        with mock.patch.object(parser, 'page_to_parse', side_effect=listings):
+            parser.pages_for_category(parser.CATEGORY)
+
+    return measure(run, repeat)
+
+
+def bench_add_hero_specific_responses(size, repeat):
+    """Method that times loading size responses (spread over wiki pages of 10 responses)
+    into a fresh responses database."""
+    pairs = synthetic_data.responses(size)
+    pages = [synthetic_data.full_media_page(pairs[start:start + 10])
+             for start in range(0, size, 10)]
+    endings = ['Page_' + str(index) for index in range(len(pages))]
+    pages_by_url = dict(zip([parser.URL_BEGINNING + ending for ending in endings], pages))
+
+    def setup():
+        if os.path.exists('responses.db'):
+            os.remove('responses.db')
+        database.create_responses_database()
+
+    def run():
+        with mock.patch.object(parser, 'page_to_parse', side_effect=pages_by_url.get), \
+                mock.patch('builtins.print'):
+            database.add_hero_specific_responses(endings)
+
+    return measure(run, repeat, setup)
+
+
+def bench_add_hero_ids_to_responses(size, repeat):
+    """Method that times assigning hero ids to size responses without a hero."""
+    pairs = synthetic_data.responses(size)
+    heroes = {hero: hero for hero in synthetic_data.HERO_NAMES}
+
+    def setup():
+        if os.path.exists('responses.db'):
+            os.remove('responses.db')
+        database.create_responses_database()
+        conn = sqlite3.connect('responses.db')
+        conn.execute('CREATE TABLE heroes (id integer primary key autoincrement, name text, '
+                     'img_dir text, css text)')
+        conn.executemany("INSERT INTO heroes(name) VALUES (?)", [[hero] for hero in heroes])
+        conn.executemany("INSERT INTO responses(response, link) VALUES (?, ?)",
+                         [(text, hero + '-' + str(index) + '.mp3')
+                          for index, (hero, text) in enumerate(pairs)])
+        conn.commit()
+        conn.close()
+
+    def run():
+        with mock.patch.object(parser, 'dictionary_from_file', return_value=heroes):
+            database.add_hero_ids_to_responses()
+
+    return measure(run, repeat, setup)
+
+
+def bench_comments_database(size, repeat):
+    """Method that times creating the comments database with size already done comment ids
+    and pruning it afterwards."""
+    ids = ['c' + format(index, 'x') for index in range(size)]
+
+    def setup():
+        if os.path.exists('comments.db'):
+            os.remove('comments.db')
+
+    def run():
+        with mock.patch.object(database, 'load_already_done_comments', return_value=ids), \
+                mock.patch('builtins.print'):
+            database.create_comments_database()
+            database.delete_old_comment_ids()
+
+    return measure(run, repeat, setup)
+
+
+def bench_reply_path(size, repeat):
+    """Method that times the reply path (already done check, response lookup in the loaded index
+    and reply text) for a stream of size comments against a catalog of size responses."""
+    pairs = synthetic_data.responses(size)
+    comments = [FakeComment(comment) for comment in synthetic_data.comment_stream(pairs, size)]
+
+    database.create_responses_database()
+    responses_connection = sqlite3.connect('responses.db')
+    responses_connection.executemany(
+        "INSERT INTO responses(response, link, hero, stripped) VALUES (?, ?, ?, ?)",
+        [(text.lower(), 'link', hero, matcher.stripped_response(text)) for hero, text in pairs])
+    responses_connection.commit()
+    index = catalog.ResponseIndex(responses_connection)
+
+    comments_connection = sqlite3.connect(':memory:')
+    comments_cursor = comments_connection.cursor()
+
+    def setup():
+        comments_cursor.execute('DROP TABLE IF EXISTS comments')
+        dedupe.create_comments_table(comments_cursor)
+
+    def run():
+        for comment in comments:
+            gwentresponses.process_comment(comment, index, comments_cursor)
+
+    try:
+        return measure(run, repeat, setup)
+    finally:
+        responses_connection.close()
+        comments_connection.close()
+
+
+def bench_search_responses(size, repeat):
+    """Method that times 100 keyword searches (prefix matching, ranking, every fifth one filtered
+    by hero) in the search index of a catalog of size responses."""
+    pairs = synthetic_data.responses(size)
+    heroes = {hero: hero_id for hero_id, hero in enumerate(synthetic_data.HERO_NAMES)}
+    queries = [' '.join(text.split()[:2])[:-1] for _, text in synthetic_data.responses(100, seed=1)]
+
+    database.create_responses_database()
+    database.create_search_index()
+    connection = sqlite3.connect('responses.db')
+    connection.executemany("INSERT INTO responses(response, link, hero, hero_id) VALUES (?, ?, ?, ?)",
+                           [(text.lower(), 'link', hero, heroes[hero]) for hero, text in pairs])
+    connection.commit()
+    cursor = connection.cursor()
+
+    def run():
+        for index, query in enumerate(queries):
+            search.search_responses(cursor, query, hero_id=index % 13 if index % 5 == 0 else None)
+
+    try:
+        return measure(run, repeat)
+    finally:
+        connection.close()
+
+
+def bench_intake_queue(size, repeat):
+    """Method that times pushing a burst of size comments into an intake queue of 1000 comments
+    (most of them shed) and popping them in batches of 100."""
+    comments = [FakeComment(comment) for comment in synthetic_data.comment_stream([], size)]
+    newest = comments[-1].created_utc
+
+    def run():
+        intake_queue = intake.IntakeQueue(max_size=1000, max_age=size, clock=lambda: newest)
+        for comment in comments:
+            intake_queue.push(comment)
+        while intake_queue.pop_batch(100, timeout=0):
+            pass
+
+    return measure(run, repeat)
+
+
+def synthetic_dictionary(size):
+    """Method that returns a responses dictionary (response text - link) of the given size."""
+    return {text.lower(): parser.value_from_element(synthetic_data.media_element(hero, text))
+            for hero, text in synthetic_data.responses(size)}
+
+
+def bench_save_dictionary(size, repeat):
+    """Method that times the atomic, streamed export of a dictionary of size responses
+    in JSON and in the binary format."""
+    dictionary = synthetic_dictionary(size)
+
+    def run():
+        dictionary_files.save_dictionary('dictionary.json', dictionary)
+        dictionary_files.save_dictionary('dictionary.bin', dictionary, binary=True)
+
+    return measure(run, repeat)
+
+
+def bench_load_json_dictionary(size, repeat):
+    """Method that times loading a dictionary of size responses saved as JSON (json.load)."""
+    dictionary_files.save_dictionary('dictionary.json', synthetic_dictionary(size))
+    return measure(lambda: dictionary_files.load_dictionary('dictionary.json'), repeat)
+
+
+def bench_load_binary_dictionary(size, repeat):
+    """Method that times loading a dictionary of size responses saved in the binary format."""
+    dictionary_files.save_dictionary('dictionary.bin', synthetic_dictionary(size), binary=True)
+    return measure(lambda: dictionary_files.load_dictionary('dictionary.bin'), repeat)
+
+
+class FakeComment:
+    """Class standing in for a praw Comment in the reply path benchmark (replies are dropped)."""
+
+    def __init__(self, data):
+        self.id = data["id"]
+        self.body = data["body"]
+        self.created_utc = data["created_utc"]
+        self.parent_id = data["parent_id"]
+
+    def reply(self, text):
+        """Method that returns the reply comment instead of sending it."""
+        return FakeComment({"id": "r" + self.id, "body": text, "created_utc": self.created_utc,
+                            "parent_id": "t1_" + self.id})
+
+
+BENCHMARKS = [bench_create_list_of_responses, bench_response_text_from_element,
+              bench_pages_for_category, bench_add_hero_specific_responses,
+              bench_add_hero_ids_to_responses, bench_comments_database, bench_reply_path,
+              bench_search_responses, bench_intake_queue, bench_save_dictionary,
+              bench_load_json_dictionary, bench_load_binary_dictionary]
+
+
+def current_commit():
+    """Method that returns the hash of the checked out commit (or None outside of git)."""
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=os.path.dirname(__file__),
+                                         stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode().strip()
+
+
+def run_benchmarks(sizes, repeat, names=None):
+    """Method that runs the benchmarks (all or the ones with given names) for every size
+    in a temporary working directory and returns the results dictionary."""
+    results = {}
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            for benchmark in BENCHMARKS:
+                name = benchmark.__name__[len('bench_'):]
+                if names and name not in names:
+                    continue
+                results[name] = {}
+                for size in sizes:
+                    results[name][str(size)] = benchmark(size, repeat)
+                    print("{:<32} {:>7} {:>12.6f}s".format(name, size,
+                                                           results[name][str(size)]["best"]))
+                for db_file in ('responses.db', 'comments.db', 'dictionary.json', 'dictionary.bin'):
+                    if os.path.exists(db_file):
+                        os.remove(db_file)
+        finally:
+            os.chdir(previous_dir)
+
+    return {"commit": current_commit(),
+            "date": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results}
+
+
+def save_results(report, filename=None):
+    """Method that saves the report as JSON in the results directory and returns its path."""
+    if filename is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        filename = os.path.join(RESULTS_DIR, stamp + '-' + (report["commit"] or 'nogit') + '.json')
+    with open(filename, 'w') as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+    return filename
+
+
+def compare_results(old_report, new_report):
+    """Method that returns a list of (benchmark, size, old time, new time, ratio) tuples
+    for the benchmarks present in both reports (ratio above 1 means the new run is slower)."""
+    comparison = []
+    for name, sizes in sorted(new_report["results"].items()):
+        for size, timing in sorted(sizes.items(), key=lambda item: int(item[0])):
+            try:
+                old_best = old_report["results"][name][size]["best"]
+            except KeyError:
+                continue
+            comparison.append((name, int(size), old_best, timing["best"],
+                               timing["best"] / old_best if old_best else float('inf')))
+    return comparison
+
+
+def main(argv=None):
+    """Method that parses the command line arguments, runs the benchmarks and saves the results."""
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    argument_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    argument_parser.add_argument('--only', nargs='+', help='names of benchmarks to run')
+    argument_parser.add_argument('--output', help='file to save the JSON results to')
+    argument_parser.add_argument('--compare', help='JSON results of an earlier run')
+    args = argument_parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.repeat, args.only)
+    print("Results saved to " + save_results(report, args.output))
+
+    if args.compare:
+        with open(args.compare) as file:
+            old_report = json.load(file)
+        print("\nCompared with " + str(old_report.get("commit")) + ":")
+        for name, size, old_best, new_best, ratio in compare_results(old_report, report):
+            print("{:<32} {:>7} {:>12.6f}s -> {:>12.6f}s  x{:.2f}".format(name, size, old_best,
+                                                                          new_best, ratio))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
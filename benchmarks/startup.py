@@ -0,0 +1,89 @@
+"""Module used to measure the start-up time of the bot entry point.
+
+The entry point is imported in a fresh interpreter with "python -X importtime", so the results
+show both the total import time and the modules that take the longest to import:
+
+    python -m benchmarks.startup --repeat 10"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import run_benchmarks
+
+__author__ = 'Jonarzz'
+
+
+ENTRY_POINT = 'gwentresponses'
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(output):
+    """Method that returns a dictionary of module name - (self, cumulative) import time
+    in microseconds parsed from the "-X importtime" output."""
+    modules = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def import_entry_point(module=ENTRY_POINT):
+    """Method that imports the module in a fresh interpreter and returns the wall time
+    of the whole process (seconds) and the parsed import times."""
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                             cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                             universal_newlines=True, check=True)
+    wall_time = time.perf_counter() - start
+    return wall_time, parse_importtime(process.stderr)
+
+
+def measure_startup(module=ENTRY_POINT, repeat=5, top=15):
+    """Method that imports the module repeat times and returns the report with the best and
+    median wall time, the median import time of the module and its slowest imports."""
+    wall_times = []
+    runs = []
+    for _ in range(repeat):
+        wall_time, modules = import_entry_point(module)
+        wall_times.append(wall_time)
+        runs.append(modules)
+
+    cumulative = {name: statistics.median(run[name][1] for run in runs if name in run)
+                  for name in runs[-1]}
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"module": module,
+            "wall": {"best": min(wall_times), "median": statistics.median(wall_times),
+                     "repeat": repeat},
+            "import_us": cumulative.get(module),
+            "imported_modules": sorted(runs[-1]),
+            "slowest_us": slowest}
+
+
+def main(argv=None):
+    """Method that parses the command line arguments, measures the start-up and saves the results."""
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--module', default=ENTRY_POINT)
+    argument_parser.add_argument('--repeat', type=int, default=5)
+    argument_parser.add_argument('--output', help='file to save the JSON results to')
+    args = argument_parser.parse_args(argv)
+
+    startup = measure_startup(args.module, args.repeat)
+    print("{}: {:.1f} ms wall, {:.1f} ms import".format(args.module,
+                                                       startup["wall"]["median"] * 1000,
+                                                       (startup["import_us"] or 0) / 1000))
+    for name, microseconds in startup["slowest_us"]:
+        print("{:<40} {:>10.1f} ms".format(name, microseconds / 1000))
+
+    report = {"commit": run_benchmarks.current_commit(), "results": {"startup": startup}}
+    print("Results saved to " + run_benchmarks.save_results(report, args.output))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
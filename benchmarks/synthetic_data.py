@@ -0,0 +1,80 @@
+# coding=UTF-8
+
+"""Module used to generate synthetic wiki pages, category listings and comment streams
+so that the bot can be benchmarked offline with reproducible data."""
+
+import json
+import random
+
+__author__ = 'Jonarzz'
+
+
+MEDIA_URL = 'https://gamepedia.cursecdn.com/gwent_gamepedia/{0}/{0}{1}/{2}.mp3'
+HERO_NAMES = ['Geralt', 'Ciri', 'Yennefer', 'Triss', 'Dandelion', 'Zoltan', 'Eredin',
+              'Emhyr', 'Foltest', 'Francesca', 'Unseen Elder', 'Eithne', 'Radovid']
+WORDS = ['fancy', 'a', 'game', 'of', 'gwent', 'wind', 'howling', 'the', 'hunt', 'is',
+         'coming', 'for', 'you', 'witcher', 'sword', 'silver', 'steel', 'monsters',
+         'never', 'trust', 'sorceress', 'toss', 'coin', 'valley', 'plenty', 'medallion',
+         'humming', 'winter', 'wolves', 'elder', 'blood', 'king', 'queen', 'crown']
+
+
+def response_text(rng, index):
+    """Method that returns a response text made of random words. The index is appended,
+    so that every generated response is unique."""
+    words = [rng.choice(WORDS) for _ in range(rng.randint(2, 6))]
+    return ' '.join(words).capitalize() + ' ' + str(index) + rng.choice(['.', '!', '?', ''])
+
+
+def media_element(hero, text):
+    """Method that returns a html "fullMedia" div in the same shape as on the wiki file pages."""
+    filename = (hero + ' - ' + text).replace(' ', '_')
+    url = MEDIA_URL.format(len(filename) % 10, len(text) % 10, filename)
+    return ('<div class="fullMedia"><a class="internal" href="{}" title="{} - {}.mp3">{}.mp3</a>'
+            ' <span class="fileInfo">(file size: 31 KB, MIME type: audio/mpeg)</span></div>'
+            .format(url, hero, text, filename))
+
+
+def responses(count, seed=0):
+    """Method that returns a list of (hero, response text) pairs of the given length."""
+    rng = random.Random(seed)
+    return [(rng.choice(HERO_NAMES), response_text(rng, index)) for index in range(count)]
+
+
+def full_media_page(pairs):
+    """Method that returns a html body of a wiki page containing a "fullMedia" div
+    for each of the given (hero, response text) pairs."""
+    body = ''.join(media_element(hero, text) for hero, text in pairs)
+    return ('<!DOCTYPE html><html><head><title>Audio</title></head><body>'
+            '<div id="content"><div class="mw-parser-output">{}</div></div></body></html>'
+            .format(body))
+
+
+def category_listings(titles, page_size=500):
+    """Method that returns a list of JSON bodies as returned by the wiki categorymembers API,
+    split into pages of the given size and chained with "continue" codes."""
+    listings = []
+    for start in range(0, len(titles), page_size):
+        members = [{"ns": 6, "title": title} for title in titles[start:start + page_size]]
+        listing = {"batchcomplete": "", "query": {"categorymembers": members}}
+        if start + page_size < len(titles):
+            listing["continue"] = {"cmcontinue": "file|" + str(start + page_size), "continue": "-||"}
+        listings.append(json.dumps(listing))
+    return listings
+
+
+def comment_stream(pairs, count, hit_ratio=0.3, seed=0):
+    """Method that returns a list of comment dictionaries (id, body, created_utc, parent_id).
+    Roughly hit_ratio of the comments quote one of the given responses, the rest are noise."""
+    rng = random.Random(seed)
+    comments = []
+    for index in range(count):
+        if pairs and rng.random() < hit_ratio:
+            body = rng.choice(pairs)[1]
+            body = rng.choice([body, body.lower(), body.upper(), body + '!!!'])
+        else:
+            body = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 30)))
+        comments.append({"id": "c" + format(index, 'x'),
+                         "body": body,
+                         "created_utc": 1500000000 + index,
+                         "parent_id": rng.choice(["t3_abc", "t1_" + format(max(index - 1, 0), 'x')])})
+    return comments
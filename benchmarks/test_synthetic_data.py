@@ -0,0 +1,71 @@
+"""Module used to test synthetic_data module methods."""
+
+import json
+import unittest
+from unittest import mock
+
+from benchmarks import synthetic_data
+from responses_wiki import gwent_wiki_parser as parser
+
+__author__ = 'Jonarzz'
+
+
+class SyntheticDataTest(unittest.TestCase):
+    """Class used to test synthetic_data module.
+    Inherits from TestCase class of unittest module."""
+
+    def test_responses(self):
+        """Method testing responses method from synthetic_data module.
+
+        The method checks if the generated responses are unique and reproducible for a given seed.
+        """
+        pairs = synthetic_data.responses(200, seed=3)
+
+        self.assertEqual(len({text for _, text in pairs}), 200)
+        self.assertEqual(pairs, synthetic_data.responses(200, seed=3))
+
+    def test_full_media_page(self):
+        """Method testing full_media_page method from synthetic_data module.
+
+        The method checks if the generated page is parsed by the wiki parser
+        into the same responses, links and hero names it was generated from.
+        """
+        pairs = synthetic_data.responses(5)
+        page = synthetic_data.full_media_page(pairs)
+
+        with mock.patch.object(parser, 'page_to_parse', return_value=page):
+            elements = parser.create_list_of_responses('Audio')
+
+        self.assertEqual(len(elements), 5)
+        for element, (hero, text) in zip(elements, pairs):
+            self.assertEqual(parser.response_text_from_element(element),
+                             text.lower().replace("!", ""))
+            self.assertEqual(parser.short_hero_name_from_url(element), hero)
+            self.assertTrue(parser.value_from_element(element).endswith('.mp3'))
+
+    def test_category_listings(self):
+        """Method testing category_listings method from synthetic_data module.
+
+        The method checks if the continued listings are walked through by pages_for_category.
+        """
+        titles = ['File:Geralt - Line ' + str(index) + '.mp3' for index in range(1200)]
+        listings = synthetic_data.category_listings(titles)
+
+        self.assertEqual(len(listings), 3)
+        self.assertNotIn("continue", json.loads(listings[-1]))
+        with mock.patch.object(parser, 'page_to_parse', side_effect=listings):
+            self.assertEqual(len(parser.pages_for_category(parser.CATEGORY)), 1200)
+
+    def test_comment_stream(self):
+        """Method testing comment_stream method from synthetic_data module."""
+        pairs = synthetic_data.responses(10)
+        comments = synthetic_data.comment_stream(pairs, 100, hit_ratio=1)
+
+        self.assertEqual(len({comment["id"] for comment in comments}), 100)
+        texts = {text.lower().rstrip('!') for _, text in pairs}
+        for comment in comments:
+            self.assertIn(comment["body"].lower().rstrip('!'), texts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,18 @@
-"""Module used to configure the connection to the Reddit API."""
+"""Module used to configure the connection to the Reddit API.
+
+The Reddit API client is created once per process and its access token is shared with the other
+bot processes (and kept over restarts) through the token cache (see responses_bot/token_cache.py),
+so starting a worker or reconnecting the stream does not have to refresh the token."""
+
+import hashlib
+import os
+import threading
 
 import praw
 
 import prawcore
 
+from responses_bot import token_cache
 import gwent_responses_properties as properties
 
 __author__ = 'Jonarzz'
@@ -11,11 +20,28 @@ __author__ = 'Jonarzz'
 
 INVALID_CODE_ERR_MSG = 'Invalid access code'
 
+_reddit = None
+_reddit_pid = None
+_reddit_lock = threading.Lock()
+
+
+def token_cache_key():
+    """Method that returns the key of the cached tokens of the application and the account."""
+    return hashlib.sha256((properties.APP_ID + ':' + properties.APP_REFRESH_CODE).encode('UTF-8')).hexdigest()
+
 
 def get_reddit():
-    """Method preparing the connection to Reddit API using OAuth."""
-    reddit = praw.Reddit(user_agent=properties.USER_AGENT, client_id=properties.APP_ID, client_secret=properties.APP_SECRET, refresh_token=properties.APP_REFRESH_CODE)
-    return reddit
+    """Method preparing the connection to Reddit API using OAuth (once per process,
+    the following calls return the same object)."""
+    global _reddit, _reddit_pid
+    with _reddit_lock:
+        if _reddit is None or _reddit_pid != os.getpid():
+            reddit = praw.Reddit(user_agent=properties.USER_AGENT, client_id=properties.APP_ID, client_secret=properties.APP_SECRET, refresh_token=properties.APP_REFRESH_CODE)
+            authorizer = getattr(reddit._core, '_authorizer', None)
+            if properties.APP_REFRESH_CODE and isinstance(authorizer, prawcore.Authorizer):
+                token_cache.use_token_cache(authorizer, token_cache.TokenCache(token_cache_key()))
+            _reddit, _reddit_pid = reddit, os.getpid()
+        return _reddit
 
 
 def get_account():
@@ -30,7 +56,11 @@ def get_access_information():
     Requires the user to type in the access_code that can be retrieved by attaching the account
     connected to the Reddit API to the user's Reddit account. The code is provided in a link after
     accepting the requirements (provided in the script scope in the properties).
+    The scopes of a cached token are returned without asking Reddit.
     """
+    cached = token_cache.TokenCache(token_cache_key()).load()
+    if cached is not None:
+        return set(cached['scopes'])
     reddit = get_reddit()
     try:
         access_information = reddit.auth.scopes()
@@ -0,0 +1,199 @@
+# coding=UTF-8
+
+"""Module used to run the bot's matching over historical comments from dump files.
+
+The dump is a (large) file with one JSON comment per line, as in the Reddit comment dumps:
+{"id": ..., "subreddit": ..., "body": ..., "created_utc": ..., ...}. The file is memory-mapped and
+split into chunks at line boundaries, the chunks are processed by a pool of worker processes with
+the same normalization, exclusions and matching as the live bot, and the candidate replies and
+the hit statistics are written in bulk to the backfill database. A worker reads its chunk in blocks
+and decodes only the lines of the served subreddits (found by a pattern over the raw line), as
+most of the dump comes from the other subreddits:
+
+    python gwent_responses_backfill.py RC_2017-06.ndjson --workers 8"""
+
+import argparse
+import collections
+import datetime
+import json
+import mmap
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from responses_bot import catalog
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+CHUNKS_PER_WORKER = 4
+BLOCK_SIZE = 16 * 1024 * 1024
+SKIPPED_BODIES = ('', '[deleted]', '[removed]')
+
+_catalogs = None
+_served = None
+
+
+def create_backfill_database(cursor):
+    """Method that creates the tables for the backfill runs, their candidate replies
+    and hit statistics per game."""
+    cursor.execute('CREATE TABLE IF NOT EXISTS backfill_runs (id integer primary key autoincrement, '
+                   'dump text, date date, lines integer, comments integer, matched integer, '
+                   'errors integer, seconds real)')
+    cursor.execute('CREATE TABLE IF NOT EXISTS backfill_candidates (run_id integer, comment_id text, '
+                   'subreddit text, game text, created_utc integer, response text, link text, hero text)')
+    cursor.execute('CREATE TABLE IF NOT EXISTS backfill_games (run_id integer, game text, '
+                   'comments integer, matched integer)')
+
+
+def chunk_ranges(filename, chunks):
+    """Method that splits the file into at most chunks (start, end) byte ranges
+    of similar size, ending at line boundaries."""
+    size = os.path.getsize(filename)
+    if size == 0:
+        return []
+    boundaries = [0]
+    with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for chunk in range(1, chunks):
+            position = data.find(b'\n', max(size * chunk // chunks, boundaries[-1]))
+            boundaries.append(size if position == -1 else position + 1)
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+def served_pattern(subreddits):
+    """Method that returns the pattern matching the raw dump lines of the comments
+    from the subreddits (case insensitive, as the subreddits of the catalogs)."""
+    names = b'|'.join(re.escape(subreddit.encode('UTF-8')) for subreddit in subreddits)
+    return re.compile(rb'"subreddit"\s*:\s*"(?:' + names + rb')"', re.IGNORECASE)
+
+
+def _init_worker(games):
+    """Method that prepares the catalogs of the games in a worker process."""
+    global _catalogs, _served
+    _catalogs = catalog.Catalogs(games, max_loaded=max(len(games), 1))
+    _served = served_pattern(_catalogs.subreddits())
+
+
+def block_ranges(data, start, end, block_size=None):
+    """Method that splits the byte range of the memory-mapped file into (start, end) ranges
+    of about block_size bytes, ending at line boundaries."""
+    block_size = block_size or BLOCK_SIZE
+    ranges = []
+    while start < end:
+        position = data.find(b'\n', start + block_size, end) if start + block_size < end else -1
+        block_end = end if position == -1 else position + 1
+        ranges.append((start, block_end))
+        start = block_end
+    return ranges
+
+
+def match_comment(catalogs, comment):
+    """Method that returns the game name and the (response, link, hero) tuple if the comment
+    (dictionary from the dump) quotes a response of the game served on its subreddit.
+    The game name is None if the subreddit is not served (or its game was dropped, as in the live bot,
+    because its responses database is missing), the match is None if nothing matched."""
+    subreddit = comment.get('subreddit') or ''
+    served = catalogs.catalog_for_subreddit(subreddit)
+    if served is None:
+        return None, None
+    index = catalogs.index_for_subreddit(subreddit)
+    if index is None:
+        return None, None
+    body = comment.get('body') or ''
+    if body in SKIPPED_BODIES:
+        return served.name, None
+    return served.name, index.find_response(body)
+
+
+def process_chunk(filename, start, end):
+    """Method that processes the comments from the byte range of the dump file.
+    Returns a list of candidate replies (comment id, subreddit, game, created_utc, response, link,
+    hero) and the counters: lines, errors (lines of the served subreddits that could not be
+    decoded) and comments and matches per game."""
+    candidates = []
+    counters = collections.Counter()
+    with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for block_start, block_end in block_ranges(data, start, end):
+            for line in data[block_start:block_end].split(b'\n'):
+                if not line or line.isspace():
+                    continue
+                counters['lines'] += 1
+                if _served.search(line) is None:
+                    continue
+                try:
+                    comment = json.loads(line)
+                    game, match = match_comment(_catalogs, comment)
+                except (ValueError, AttributeError, TypeError):
+                    counters['errors'] += 1
+                    continue
+                if game is None:
+                    continue
+                counters['comments', game] += 1
+                if match is not None:
+                    counters['matched', game] += 1
+                    candidates.append((comment.get('id'), comment.get('subreddit'), game,
+                                       comment.get('created_utc')) + tuple(match))
+    return candidates, counters
+
+
+def _process_chunk(arguments):
+    """Method unpacking the arguments of process_chunk (used with Pool.imap_unordered)."""
+    return process_chunk(*arguments)
+
+
+def backfill(filename, workers=None, output=None, games=None):
+    """Method that runs the matching over the dump file with a pool of worker processes
+    and saves the candidate replies and the statistics. Returns the id of the run
+    and the counters."""
+    workers = workers or os.cpu_count() or 1
+    games = games or properties.GAMES
+    start_time = time.monotonic()
+
+    conn = sqlite3.connect(output or properties.BACKFILL_DB_FILENAME)
+    curse = conn.cursor()
+    create_backfill_database(curse)
+    curse.execute("INSERT INTO backfill_runs(dump, date) VALUES (?, ?)",
+                  (os.path.abspath(filename), datetime.date.today()))
+    run_id = curse.lastrowid
+
+    counters = collections.Counter()
+    chunks = [(filename, start, end) for start, end in chunk_ranges(filename, workers * CHUNKS_PER_WORKER)]
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(games,)) as pool:
+        for candidates, chunk_counters in pool.imap_unordered(_process_chunk, chunks):
+            curse.executemany("INSERT INTO backfill_candidates VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              [(run_id,) + candidate for candidate in candidates])
+            counters.update(chunk_counters)
+
+    for game in games:
+        curse.execute("INSERT INTO backfill_games VALUES (?, ?, ?, ?)",
+                      (run_id, game, counters['comments', game], counters['matched', game]))
+    comments = sum(counters['comments', game] for game in games)
+    matched = sum(counters['matched', game] for game in games)
+    curse.execute("UPDATE backfill_runs SET lines=?, comments=?, matched=?, errors=?, seconds=? WHERE id=?",
+                  (counters['lines'], comments, matched, counters['errors'],
+                   time.monotonic() - start_time, run_id))
+    conn.commit()
+    curse.close()
+
+    print("BACKFILL RUN " + str(run_id) + "\nLines: " + str(counters['lines']) +
+          "\nComments: " + str(comments) + "\nMatched: " + str(matched))
+    return run_id, counters
+
+
+def main(argv=None):
+    """Method that parses the command line arguments and runs the backfill."""
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('dump', help='file with one JSON comment per line')
+    argument_parser.add_argument('--workers', type=int, help='number of worker processes')
+    argument_parser.add_argument('--output', help='backfill database file')
+    args = argument_parser.parse_args(argv)
+    backfill(args.dump, args.workers, args.output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
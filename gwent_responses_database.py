@@ -10,22 +10,46 @@ import os
 import datetime
 import re
 
-from responses_wiki import gwent_wiki_parser as parser
+from responses_bot import catalog, dedupe, matcher
 import gwent_responses_properties as properties
 
 
 SCRIPT_DIR = os.path.dirname(__file__)
 
-
-def create_responses_database():
+RESPONSES_COLUMNS = ['response', 'link', 'hero', 'hero_id', 'stripped', 'page']
+RESPONSES_TABLE_SQL = ('CREATE TABLE IF NOT EXISTS responses (id integer primary key, response text, link text, '
+                       'hero text, hero_id integer, stripped text, page text)')
+
+SEARCH_INDEX_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS responses_fts USING fts5(
+    response, content='responses', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3');
+CREATE TRIGGER IF NOT EXISTS responses_fts_insert AFTER INSERT ON responses BEGIN
+    INSERT INTO responses_fts(rowid, response) VALUES (new.id, new.response);
+END;
+CREATE TRIGGER IF NOT EXISTS responses_fts_delete AFTER DELETE ON responses BEGIN
+    INSERT INTO responses_fts(responses_fts, rowid, response) VALUES ('delete', old.id, old.response);
+END;
+CREATE TRIGGER IF NOT EXISTS responses_fts_update AFTER UPDATE OF response ON responses BEGIN
+    INSERT INTO responses_fts(responses_fts, rowid, response) VALUES ('delete', old.id, old.response);
+    INSERT INTO responses_fts(rowid, response) VALUES (new.id, new.response);
+END;
+"""
+
+
+def create_responses_database(game=None):
     """Method that creates an SQLite database with pairs response-link
     based on the JSON file with such pairs which was used before."""
     #responses_dictionary = parser.dictionary_from_file(properties.RESPONSES_FILENAME)
 
-    conn = sqlite3.connect('responses.db')
+    conn = sqlite3.connect(catalog.game_settings(game)['responses_db'])
     curse = conn.cursor()
 
-    curse.execute('CREATE TABLE IF NOT EXISTS responses (response text, link text, hero text, hero_id integer, stripped text)')
+    curse.execute(RESPONSES_TABLE_SQL)
+    add_page_column(curse)
+    add_id_column(curse)
+    curse.execute('CREATE INDEX IF NOT EXISTS responses_stripped ON responses (stripped)')
+    curse.execute('CREATE INDEX IF NOT EXISTS responses_page ON responses (page)')
     # This was from the original Dota bot... but wasn't necessary for me at the moment. Leaving it commented because it was kinda important.
     #for key, value in responses_dictionary.items():
         #print(key, value)
@@ -33,18 +57,62 @@ def create_responses_database():
 
     conn.commit()
     curse.close()
+    create_search_index(game)
+
+
+def add_page_column(cursor):
+    """Method that adds the column with the wiki page (ending) the response was parsed from
+    to the responses table created before it existed, and its index (the responses without a page
+    are replaced when the rebuild of the category finishes, see add_hero_specific_responses)."""
+    cursor.execute("PRAGMA table_info(responses)")
+    if 'page' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE responses ADD COLUMN page text')
+    cursor.execute('CREATE INDEX IF NOT EXISTS responses_page ON responses (page)')
+
+
+def add_id_column(cursor):
+    """Method that copies the responses table created before it had the id column to a new one
+    with it (a primary key column can not be added to an existing table). The search index uses
+    the ids, as the implicit rowids can change on VACUUM, so the old index and its triggers
+    are dropped (create_search_index rebuilds them)."""
+    cursor.execute("PRAGMA table_info(responses)")
+    if 'id' in [column[1] for column in cursor.fetchall()]:
+        return
+    columns = ', '.join(RESPONSES_COLUMNS)
+    for trigger in ('responses_fts_insert', 'responses_fts_delete', 'responses_fts_update'):
+        cursor.execute('DROP TRIGGER IF EXISTS ' + trigger)
+    cursor.execute('DROP TABLE IF EXISTS responses_fts')
+    cursor.execute('ALTER TABLE responses RENAME TO responses_without_id')
+    cursor.execute(RESPONSES_TABLE_SQL)
+    cursor.execute('INSERT INTO responses(' + columns + ') SELECT ' + columns
+                   + ' FROM responses_without_id ORDER BY rowid')
+    cursor.execute('DROP TABLE responses_without_id')
+
+
+def create_search_index(game=None):
+    """Method that creates the full text search index (SQLite FTS5) over the responses with
+    the triggers keeping it in sync with the responses table (rebuilt from the table, so it can be
+    added to an existing database). Called by create_responses_database."""
+    conn = sqlite3.connect(catalog.game_settings(game)['responses_db'])
+    curse = conn.cursor()
+
+    curse.executescript(SEARCH_INDEX_SQL)
+    curse.execute("INSERT INTO responses_fts(responses_fts) VALUES ('rebuild')")
+
+    conn.commit()
+    curse.close()
 
 
 def create_comments_database():
     """Method that creates an SQLite database with ids of already checked comments."""
     already_done_comments = load_already_done_comments()
 
-    conn = sqlite3.connect('comments.db', detect_types=sqlite3.PARSE_DECLTYPES)
+    conn = sqlite3.connect(properties.COMMENTS_DB_FILENAME, detect_types=sqlite3.PARSE_DECLTYPES)
     curse = conn.cursor()
 
-    curse.execute('CREATE TABLE IF NOT EXISTS comments (id text, date date)')
+    dedupe.create_comments_table(curse)
     for commentid in already_done_comments:
-        curse.execute("INSERT INTO comments VALUES (?, ?)", (commentid, datetime.date.today()))
+        curse.execute("INSERT INTO comments(id, date) VALUES (?, ?)", (commentid, datetime.date.today()))
 
     conn.commit()
     curse.close()
@@ -62,7 +130,7 @@ def delete_old_comment_ids():
     (number corresponding to number of days)."""
     furthest_date = datetime.date.today() - datetime.timedelta(days=properties.NUMBER_OF_DAYS_TO_DELETE_COMMENT)
 
-    conn = sqlite3.connect('comments.db', detect_types=sqlite3.PARSE_DECLTYPES)
+    conn = sqlite3.connect(properties.COMMENTS_DB_FILENAME, detect_types=sqlite3.PARSE_DECLTYPES)
     curse = conn.cursor()
     curse.execute("DELETE FROM comments WHERE date < ?", ([str(furthest_date)]))
     conn.commit()
@@ -73,37 +141,57 @@ def delete_old_comment_ids():
     print("COMMENTS DB CLR\nNumber of IDs: " + str(num_of_ids))
 
 
-def add_hero_specific_responses(endings=None):
-    """Method that adds hero specific responses to the responses database.
-    If no argument is provided, all responses pages are parsed.
-    Argument expected: list of URL path endings (after the "http://dota2.gamepedia.com/")
-    pointing to the page with responses."""
-    database_connection = sqlite3.connect('responses.db')
-    cursor = database_connection.cursor()
+def add_hero_specific_responses(endings=None, game=None):
+    """Method that adds hero specific responses to the responses database of the game.
+    If no endings are provided, all responses pages of the game's category are parsed.
+    Argument expected: list of URL path endings (after the game's wiki url, e.g. "https://gwent.gamepedia.com/")
+    pointing to the page with responses.
 
-    if not endings:
-        endings = parser.pages_for_category(parser.CATEGORY)
+    The pages are added as a rebuild job (see responses_wiki/rebuild_jobs.py): the responses of every
+    page are committed together with its checkpoint, a run that died halfway is resumed from the
+    first unfinished page, the pages that did not change since the last run are not written again
+    and the responses of the pages no longer listed are removed when the run finishes. When the
+    rebuild of the whole category finishes, the responses saved before their pages were
+    (without a page, added again by the rebuild) are removed too, in the same transaction."""
+    from responses_wiki import gwent_wiki_parser as parser
+    from responses_wiki import rebuild_jobs
 
-    for ending in endings:
-        responses_dict = parser.create_responses_dict(ending)
+    settings = catalog.game_settings(game)
+    database_connection = sqlite3.connect(settings['responses_db'])
+    add_page_column(database_connection.cursor())
+
+    if endings:
+        job_name = 'responses:pages:' + rebuild_jobs.content_hash(list(endings))[:12]
+    else:
+        job_name = 'responses:' + settings['category']
+
+    def list_endings():
+        return list(endings) if endings else parser.pages_for_category(settings['category'], settings['wiki_url'])
+
+    def parse_page(ending):
         hero_name = parser.short_hero_name_from_url(ending)
-        print(hero_name)
-        for key, value in responses_dict.items():
-            stripped = key.replace(r".", "")
-            stripped = stripped.replace(r",", "")
-            stripped = stripped.replace(r"'", "")
-            stripped = stripped.replace(r"’", "")
-            cursor.execute("INSERT INTO responses(response, link, hero, stripped) VALUES (?, ?, ?, ?)", (key, value, hero_name, stripped))
-        database_connection.commit()
+        return [(key, value, hero_name) for key, value in parser.create_responses_dict(ending, settings['wiki_url']).items()]
 
-    cursor.close()
+    def save_page(cursor, ending, rows):
+        cursor.execute("DELETE FROM responses WHERE page=?", (ending,))
+        cursor.executemany("INSERT INTO responses(response, link, hero, stripped, page) VALUES (?, ?, ?, ?, ?)",
+                           [(key, value, hero_name, matcher.stripped_response(key), ending) for key, value, hero_name in rows])
 
+    def remove_page(cursor, ending):
+        if ending is not None:
+            cursor.execute("DELETE FROM responses WHERE page=?", (ending,))
+        elif not endings:
+            cursor.execute("DELETE FROM responses WHERE page IS NULL")
 
-def create_heroes_database():
+    rebuild_jobs.run_pages(database_connection, job_name, list_endings, parse_page, save_page, remove_page)
+    database_connection.close()
+
+
+def create_heroes_database(game=None):
     """Method that creates a database with hero names and proper css classes names as taken
     from the DotA2 subreddit and hero flair images from the reddit directory. Every hero has its
     own id, so that it can be joined with the hero from responses database."""
-    conn = sqlite3.connect('responses.db')
+    conn = sqlite3.connect(catalog.game_settings(game)['responses_db'])
     curse = conn.cursor()
     curse.execute('CREATE TABLE IF NOT EXISTS heroes (id integer primary key autoincrement, name text, img_dir text, css text)')
 
@@ -141,13 +229,15 @@ def create_heroes_database():
     curse.close()
 
 
-def add_hero_ids_to_responses():
+def add_hero_ids_to_responses(game=None):
     """Method that adds hero ids to responses not assigned to specific heroes based on short hero
-    name taken from the response link and heroes dictionary."""
-    conn = sqlite3.connect('responses.db')
+    name taken from the response link and the heroes dictionary of the game."""
+    from responses_wiki import gwent_wiki_parser as parser
+
+    conn = sqlite3.connect(catalog.game_settings(game)['responses_db'])
     curse = conn.cursor()
 
-    heroes_dict = parser.dictionary_from_file(properties.HEROES_FILENAME)
+    heroes_dict = parser.dictionary_from_file(catalog.game_settings(game)['heroes_file'])
 
     curse.execute("SELECT link FROM responses WHERE hero IS NULL AND hero_id IS NULL")
     links = curse.fetchall()
@@ -170,6 +260,7 @@ def add_hero_ids_to_responses():
 
 #if __name__ == '__main__':
     #create_responses_database()
+    #create_search_index()
     #create_comments_database()
     #add_hero_specific_responses()
     #create_heroes_database()
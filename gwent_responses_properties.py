@@ -8,11 +8,15 @@ APP_URI = ''
 APP_REFRESH_CODE = ''
 USER_AGENT = """A tool that finds a Dota 2-related comments with the game heroes\' responses and links to the proper
              audio sample from http://dota2.gamepedia.com/Category:Lists_of_responses (author: /u/Jonarz)"""
-SUBREDDIT = "dota2"
 SCOPES = ''
+# Access token shared by the bot processes and the time (seconds) before its expiry it is refreshed.
+TOKEN_CACHE_FILENAME = 'reddit_token.json'
+TOKEN_REFRESH_MARGIN_SECONDS = 5 * 60
 RESPONSES_FILENAME = ''
 HEROES_FILENAME = ''
 SHITTY_WIZARD_FILENAME = ''
+RESPONSES_DB_FILENAME = 'responses.db'
+COMMENTS_DB_FILENAME = 'comments.db'
 
 COMMENT_ENDING = """
 ---
@@ -24,39 +28,104 @@ ERROR_FILENAME = 'errorlog.log'
 LOG_FILENAME = 'GRBlog.log'
 
 NUMBER_OF_DAYS_TO_DELETE_COMMENT = 7
+NUMBER_OF_DAYS_TO_RECHECK_LINK = 3
+LINK_CHECK_WORKERS = 8
 
-EXCLUDED_RESPONSES = ["thank you", "why not?", "glimmer cape", "hood of defiance",
-                      "mask of madness", "force staff", "armlet of mordiggian",
-                      "helm of the dominator", "veil of discord", "shadow blade", "blade mail",
-                      "urn of shadows", "skull basher", "battle fury", "crimson guard",
-                      "eul's scepter", "eul's scepter of divinity", "scepter of divinity",
-                      "ethereal blade", "black king bar", "diffusal blade", "lotus orb",
-                      "silver edge", "solar crest", "medallion of courage", "rod of atos",
-                      "shiva's guard", "heaven's halberd", "sange and yasha", "monkey king bar",
-                      "orchid malevolence", "drum of endurance", "aghanim's scepter",
-                      "manta style", "eye of skadi", "hand of midas", "vladimir's offering",
-                      "refresher orb", "linken's sphere", "assault cuirass", "divine rapier",
-                      "scythe of vyse", "sheep stick", "pipe of insight", "boots of travel",
-                      "blink dagger", "moon shard", "guardian greaves", "octarine core",
-                      "heart of tarrasque", "abyssal blade", "abyssal underlord",
-                      "ancient apparition", "anti mage", "bounty hunter", "centaur warrunner",
-                      "chaos knight", "crystal maiden", "dark seer", "death prophet",
-                      "dragon knight", "drow ranger", "earth spirit", "earth shaker",
-                      "elder titan", "ember spirit", "faceless void", "keeper of the light",
-                      "legion commander", "lone druid", "naga siren", "nature's prophet",
-                      "natures prophet", "night stalker", "nyx assassin", "ogre magi",
-                      "outworld destroyer", "phantom assassin", "phantom lancer", "queen of pain",
-                      "sand king", "shadow demon", "shadow fiend", "skywrath mage",
-                      "skeleton king", "spirit breaker", "storm spirit", "templar assassin",
-                      "treant protector", "troll warlord", "vengeful spirit", "winter wyvern",
-                      "witch doctor", "wraith king", "i agree", "my bad", "ha ha", "why not",
+# Intake queue in front of the matcher: number of queued comments, age (seconds) after which
+# the comments are dropped, how much newer (seconds) top-level comments are treated as and
+# the adaptive batch size limits with the target processing time of a batch (seconds).
+INTAKE_QUEUE_SIZE = 1000
+MAX_COMMENT_AGE_SECONDS = 10 * 60
+TOP_LEVEL_PRIORITY_SECONDS = 60
+MIN_BATCH_SIZE = 1
+MAX_BATCH_SIZE = 100
+TARGET_BATCH_SECONDS = 2.0
+INTAKE_STATS_FILENAME = 'intake_stats.json'
+INTAKE_STATS_INTERVAL_SECONDS = 60
+
+# Reconciler of the replies: how often (seconds) and how far back (days) the replied comments are
+# checked for edits and deletions, and the number of fullnames fetched in one API info call.
+RECONCILE_INTERVAL_SECONDS = 15 * 60
+RECONCILE_DAYS = 1
+INFO_BATCH_SIZE = 100
+
+# On-demand profiling (SIGUSR1 - CPU, SIGUSR2 - memory, or a command sent to the admin socket,
+# disabled when the file name is empty): reports directory, default duration (seconds), CPU
+# sampling interval (seconds) and the number of frames kept for the memory allocations.
+PROFILE_DIR = 'profiles'
+PROFILE_SECONDS = 30
+PROFILE_INTERVAL_SECONDS = 0.005
+PROFILE_TRACEBACK_FRAMES = 25
+ADMIN_SOCKET_FILENAME = ''
+
+BACKFILL_DB_FILENAME = 'backfill.db'
+# Staged entries and checkpoints of the wiki dictionaries rebuild (in the responses_wiki directory).
+REBUILD_DB_FILENAME = 'rebuild.db'
+
+SEARCH_COMMAND = '!voicelines'
+NUMBER_OF_SEARCH_RESULTS = 5
+
+# Responses too common to be replied to (in any game).
+EXCLUDED_RESPONSES = ["thank you", "why not?", "i agree", "my bad", "ha ha", "why not",
                       "fair enough", "no way", "you're welcome", "very nice", "of course",
                       "well deserved", "try again", "it worked", "nice try", "seems fair",
                       "that's right", "thank god", "thank you so much", "well said", "holy shit",
-                      "so beautiful", "try harder", "go outside", "arc warden", "he he he",
-                      "pit lord", "shut up", "how so?", "hey now", "much appreciated",
-                      "i don't think so", "I know, right?", "it begins", "too soon", "well done",
-                      "i like it", "are you okay?", "ah, nice", "about time", "very good",
-                      "are you kidding me?", "at last", "got it", "what happened?", "oh boy",
-                      "nice one", "i am", "exactly so", "aphotic shield", "ghost scepter",
-                      "outworld devourer", "shadow shaman"]
+                      "so beautiful", "try harder", "go outside", "he he he", "shut up", "how so?",
+                      "hey now", "much appreciated", "i don't think so", "I know, right?",
+                      "it begins", "too soon", "well done", "i like it", "are you okay?",
+                      "ah, nice", "about time", "very good", "are you kidding me?", "at last",
+                      "got it", "what happened?", "oh boy", "nice one", "i am", "exactly so"]
+
+# Dota 2 items and hero names, too common on /r/dota2 to be replied to (used by the Dota 2 entry
+# of GAMES, commented out: the wiki parser handles only the Gwent wiki's audio pages).
+DOTA_EXCLUDED_RESPONSES = ["glimmer cape", "hood of defiance", "mask of madness", "force staff",
+                           "armlet of mordiggian", "helm of the dominator", "veil of discord",
+                           "shadow blade", "blade mail", "urn of shadows", "skull basher",
+                           "battle fury", "crimson guard", "eul's scepter",
+                           "eul's scepter of divinity", "scepter of divinity", "ethereal blade",
+                           "black king bar", "diffusal blade", "lotus orb", "silver edge",
+                           "solar crest", "medallion of courage", "rod of atos", "shiva's guard",
+                           "heaven's halberd", "sange and yasha", "monkey king bar",
+                           "orchid malevolence", "drum of endurance", "aghanim's scepter",
+                           "manta style", "eye of skadi", "hand of midas", "vladimir's offering",
+                           "refresher orb", "linken's sphere", "assault cuirass", "divine rapier",
+                           "scythe of vyse", "sheep stick", "pipe of insight", "boots of travel",
+                           "blink dagger", "moon shard", "guardian greaves", "octarine core",
+                           "heart of tarrasque", "abyssal blade", "abyssal underlord",
+                           "ancient apparition", "anti mage", "bounty hunter", "centaur warrunner",
+                           "chaos knight", "crystal maiden", "dark seer", "death prophet",
+                           "dragon knight", "drow ranger", "earth spirit", "earth shaker",
+                           "elder titan", "ember spirit", "faceless void", "keeper of the light",
+                           "legion commander", "lone druid", "naga siren", "nature's prophet",
+                           "natures prophet", "night stalker", "nyx assassin", "ogre magi",
+                           "outworld destroyer", "phantom assassin", "phantom lancer",
+                           "queen of pain", "sand king", "shadow demon", "shadow fiend",
+                           "skywrath mage", "skeleton king", "spirit breaker", "storm spirit",
+                           "templar assassin", "treant protector", "troll warlord",
+                           "vengeful spirit", "winter wyvern", "witch doctor", "wraith king",
+                           "arc warden", "pit lord", "aphotic shield", "ghost scepter",
+                           "outworld devourer", "shadow shaman"]
+
+# Games served by the bot: wiki the responses are parsed from, responses database, heroes
+# dictionary file, subreddits (lowercase) the game's responses are replied to on and the responses
+# never replied to.
+GAMES = {
+    'gwent': {'wiki_url': 'https://gwent.gamepedia.com/',
+              'category': 'Audio',
+              'responses_db': RESPONSES_DB_FILENAME,
+              'heroes_file': HEROES_FILENAME,
+              'subreddits': ['gwent'],
+              'excluded_responses': EXCLUDED_RESPONSES},
+    #'dota2': {'wiki_url': 'https://dota2.gamepedia.com/',
+    #          'category': 'Lists of responses',
+    #          'responses_db': 'dota2_responses.db',
+    #          'heroes_file': 'dota2_heroes.json',
+    #          'subreddits': ['dota2'],
+    #          'excluded_responses': EXCLUDED_RESPONSES + DOTA_EXCLUDED_RESPONSES},
+}
+DEFAULT_GAME = 'gwent'
+
+# Indexes of the games (responses loaded in memory) not used for that many seconds are evicted
+# and at most that many indexes are kept loaded at once.
+CATALOG_MAX_IDLE_SECONDS = 30 * 60
+CATALOG_MAX_LOADED = 2
@@ -0,0 +1,169 @@
+"""Module used to serve the responses of several games from one process.
+
+Every game (see GAMES in the properties file) has its own catalog: the wiki the responses come
+from, the responses database, the subreddits and the excluded responses. The responses of a game
+are loaded in memory (the index) when they are needed for the first time and evicted when they
+are not used for a while, so that the memory used by the bot stays bounded.
+
+The responses databases are opened read-only: a game whose database is missing or was never
+built is reported once and its subreddits are no longer served."""
+
+import os
+import sqlite3
+import time
+import urllib.parse
+
+from responses_bot import link_health, matcher, reply, search
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+def game_settings(game=None):
+    """Method that returns the settings dictionary of the game (the default one if not given)."""
+    return properties.GAMES[game or properties.DEFAULT_GAME]
+
+
+class ResponseIndex:
+    """Class holding the responses of a game loaded in memory (used for matching)
+    and the connection to its responses database (used for the search command)."""
+
+    def __init__(self, connection, excluded=matcher.EXCLUDED_STRIPPED):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.excluded = excluded
+        self.dead_links = link_health.load_dead_links(self.cursor)
+        self.responses = matcher.load_responses(self.cursor, self.dead_links)
+
+    def find_response(self, text):
+        """Method that returns the (response, link, hero) tuple quoted in the text or None."""
+        return matcher.find_response(self.responses, text, self.excluded)
+
+    def search_command(self, text):
+        """Method that returns the results of the search command comment text."""
+        return search.search_command(self.cursor, text, self.dead_links)
+
+    def reply_text(self, body):
+        """Method that returns the text of the bot's reply to the comment body (the results of the
+        search command or the quoted response) or None if the bot does not reply to it."""
+        if search.is_search_command(body):
+            results = self.search_command(body)
+            return reply.create_search_reply(results) if results else None
+        match = self.find_response(body)
+        if match is None:
+            return None
+        _, link, hero = match
+        return reply.create_reply(body.strip(), link, hero)
+
+    def close(self):
+        """Method that closes the connection to the responses database."""
+        self.connection.close()
+
+
+class Catalog:
+    """Class describing the responses of one game, with the index loaded on first use."""
+
+    def __init__(self, name, settings, clock=time.monotonic):
+        self.name = name
+        self.wiki_url = settings['wiki_url']
+        self.category = settings['category']
+        self.responses_db = settings['responses_db']
+        self.subreddits = [subreddit.lower() for subreddit in settings['subreddits']]
+        self.excluded = matcher.excluded_set(settings['excluded_responses'])
+        self.clock = clock
+        self.last_used = None
+        self._index = None
+
+    @property
+    def loaded(self):
+        """Property telling if the index of the catalog is loaded."""
+        return self._index is not None
+
+    def index(self):
+        """Method that returns the index of the catalog (loading it if needed)
+        and marks the catalog as used. Raises sqlite3.Error if the responses database
+        is missing or not built."""
+        if self._index is None:
+            connection = sqlite3.connect('file:{}?mode=ro'.format(
+                urllib.parse.quote(os.path.abspath(self.responses_db))), uri=True)
+            try:
+                self._index = ResponseIndex(connection, self.excluded)
+            except sqlite3.Error:
+                connection.close()
+                raise
+        self.last_used = self.clock()
+        return self._index
+
+    def evict(self):
+        """Method that drops the loaded index of the catalog."""
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+
+class Catalogs:
+    """Class holding the catalogs of all the games served by the bot. At most max_loaded indexes
+    are kept loaded (the least recently used is evicted first) and the indexes idle for more
+    than max_idle seconds are evicted by evict_idle."""
+
+    def __init__(self, games=None, max_loaded=None, max_idle=None, clock=time.monotonic):
+        if games is None:
+            games = properties.GAMES
+        self.max_loaded = properties.CATALOG_MAX_LOADED if max_loaded is None else max_loaded
+        if self.max_loaded < 1:
+            raise ValueError("At least one index must be kept loaded, max_loaded: " + repr(self.max_loaded))
+        self.max_idle = properties.CATALOG_MAX_IDLE_SECONDS if max_idle is None else max_idle
+        self.clock = clock
+        self.catalogs = {name: Catalog(name, settings, clock) for name, settings in games.items()}
+        self.by_subreddit = {subreddit: catalog for catalog in self.catalogs.values()
+                             for subreddit in catalog.subreddits}
+
+    def subreddits(self):
+        """Method that returns a sorted list of all the subreddits served by the bot."""
+        return sorted(self.by_subreddit)
+
+    def loaded(self):
+        """Method that returns a list of the catalogs with loaded indexes."""
+        return [catalog for catalog in self.catalogs.values() if catalog.loaded]
+
+    def catalog_for_subreddit(self, subreddit):
+        """Method that returns the catalog of the game served on the subreddit (or None)."""
+        return self.by_subreddit.get(subreddit.lower())
+
+    def index_for_subreddit(self, subreddit):
+        """Method that returns the index of the game served on the subreddit
+        (or None if the subreddit is not served). A game whose responses database can not
+        be loaded is reported and dropped with its subreddits."""
+        catalog = self.catalog_for_subreddit(subreddit)
+        if catalog is None:
+            return None
+        if not catalog.loaded:
+            loaded = self.loaded()
+            if len(loaded) >= self.max_loaded:
+                min(loaded, key=lambda other: other.last_used).evict()
+        try:
+            return catalog.index()
+        except sqlite3.Error as error:
+            print("CATALOG ERROR: " + catalog.name + " (" + catalog.responses_db + ") dropped: " + repr(error))
+            self.drop(catalog)
+            return None
+
+    def drop(self, catalog):
+        """Method that stops serving the game of the catalog (and its subreddits)."""
+        catalog.evict()
+        del self.catalogs[catalog.name]
+        for subreddit in catalog.subreddits:
+            if self.by_subreddit.get(subreddit) is catalog:
+                del self.by_subreddit[subreddit]
+
+    def evict_idle(self):
+        """Method that evicts the indexes not used for more than max_idle seconds."""
+        now = self.clock()
+        for catalog in self.loaded():
+            if now - catalog.last_used > self.max_idle:
+                catalog.evict()
+
+    def close(self):
+        """Method that evicts all the loaded indexes."""
+        for catalog in self.loaded():
+            catalog.evict()
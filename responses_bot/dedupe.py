@@ -0,0 +1,56 @@
+"""Module used to keep track of the comments that were already checked by the bot
+and of the bot's replies to them (checked again by the reconciler, see reconcile module)."""
+
+import datetime
+import hashlib
+
+__author__ = 'Jonarzz'
+
+
+def create_comments_table(cursor):
+    """Method that creates the table of checked comments ids with an index on the ids
+    (without it every check scans the whole table). The id of the bot's reply and the hash of
+    the replied comment's body are added to the tables created before they were saved."""
+    cursor.execute('CREATE TABLE IF NOT EXISTS comments (id text, date date, reply_id text, body_hash text)')
+    cursor.execute("PRAGMA table_info(comments)")
+    columns = [column[1] for column in cursor.fetchall()]
+    for column in ('reply_id', 'body_hash'):
+        if column not in columns:
+            cursor.execute('ALTER TABLE comments ADD COLUMN ' + column + ' text')
+    cursor.execute('CREATE INDEX IF NOT EXISTS comments_id ON comments (id)')
+
+
+def is_comment_done(cursor, comment_id):
+    """Method that checks if the comment with given id was already checked."""
+    cursor.execute("SELECT 1 FROM comments WHERE id=?", [comment_id])
+    return cursor.fetchone() is not None
+
+
+def mark_comment_done(cursor, comment_id):
+    """Method that saves the id of the checked comment with today's date
+    (used to remove old ids, see gwent_responses_database.delete_old_comment_ids)."""
+    cursor.execute("INSERT INTO comments(id, date) VALUES (?, ?)", (comment_id, datetime.date.today()))
+
+
+def body_hash(body):
+    """Method that returns the hash of the comment body saved with the reply."""
+    return hashlib.sha256(body.encode('UTF-8')).hexdigest()
+
+
+def record_reply(cursor, comment_id, reply_id, body):
+    """Method that saves the id of the bot's reply to the comment and the hash of the comment body."""
+    cursor.execute("UPDATE comments SET reply_id=?, body_hash=? WHERE id=?", (reply_id, body_hash(body), comment_id))
+
+
+def forget_reply(cursor, comment_id):
+    """Method that removes the saved reply to the comment (deleted, so not checked any more)."""
+    cursor.execute("UPDATE comments SET reply_id=NULL, body_hash=NULL WHERE id=?", (comment_id,))
+
+
+def recent_replies(cursor, days):
+    """Method that returns a list of (comment id, reply id, body hash) of the comments
+    replied to in the last days."""
+    furthest_date = datetime.date.today() - datetime.timedelta(days=days)
+    cursor.execute("SELECT id, reply_id, body_hash FROM comments WHERE reply_id IS NOT NULL AND date >= ?",
+                   (str(furthest_date),))
+    return cursor.fetchall()
@@ -0,0 +1,156 @@
+"""Module used to queue the incoming comments in front of the matcher.
+
+When the comments come faster than the bot can process them, replying to all of them in order
+would leave the bot minutes behind. The intake queue is bounded and prioritized instead: fresh and
+top-level comments are processed first, the comments older than the age budget are dropped
+(shed) and the batch size adapts to the measured processing time. The shed counts and the lag
+are kept in the queue stats, which are saved to a JSON file so that the deployment can be sized."""
+
+import bisect
+import itertools
+import json
+import threading
+import time
+
+from responses_wiki import dictionary_files
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+def is_top_level(comment):
+    """Method that checks if the comment is a direct reply to the submission."""
+    return comment.parent_id.startswith('t3_')
+
+
+class IntakeStats:
+    """Class counting the received, processed, failed and shed comments and measuring the lag
+    (seconds between the comment creation and its processing)."""
+
+    def __init__(self):
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.shed_too_old = 0
+        self.shed_overflow = 0
+        self.shed_expired = 0
+        self.queued = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+    @property
+    def shed(self):
+        """Property with the number of all the shed comments."""
+        return self.shed_too_old + self.shed_overflow + self.shed_expired
+
+    def record_processed(self, comment, now):
+        """Method that counts the processed comment and updates the lag."""
+        self.processed += 1
+        self.lag = now - comment.created_utc
+        self.max_lag = max(self.max_lag, self.lag)
+
+    def record_failed(self):
+        """Method that counts the comment whose processing failed."""
+        self.failed += 1
+
+    def as_dict(self):
+        """Method that returns the stats as a dictionary."""
+        return {"received": self.received, "processed": self.processed, "failed": self.failed,
+                "shed": self.shed,
+                "shed_too_old": self.shed_too_old, "shed_overflow": self.shed_overflow,
+                "shed_expired": self.shed_expired, "queued": self.queued,
+                "lag": round(self.lag, 3), "max_lag": round(self.max_lag, 3)}
+
+
+class IntakeQueue:
+    """Class holding the comments waiting to be processed, ordered by priority: creation time,
+    with top-level comments treated as top_level_bonus seconds newer. The queue is thread safe,
+    the comments are pushed by the thread reading the comment stream."""
+
+    def __init__(self, max_size=None, max_age=None, top_level_bonus=None, clock=time.time):
+        self.max_size = max_size or properties.INTAKE_QUEUE_SIZE
+        self.max_age = max_age or properties.MAX_COMMENT_AGE_SECONDS
+        if top_level_bonus is None:
+            top_level_bonus = properties.TOP_LEVEL_PRIORITY_SECONDS
+        self.top_level_bonus = top_level_bonus
+        self.clock = clock
+        self.stats = IntakeStats()
+        self._items = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return len(self._items)
+
+    def priority(self, comment):
+        """Method that returns the priority of the comment (the higher, the sooner processed)."""
+        if is_top_level(comment):
+            return comment.created_utc + self.top_level_bonus
+        return comment.created_utc
+
+    def push(self, comment):
+        """Method that queues the comment. Returns False if the comment was shed: it is older than
+        the age budget or the queue is full and it has lower priority than all queued comments
+        (otherwise the lowest priority comment is shed to make room)."""
+        with self._condition:
+            self.stats.received += 1
+            if self.clock() - comment.created_utc > self.max_age:
+                self.stats.shed_too_old += 1
+                return False
+
+            item = (self.priority(comment), next(self._sequence), comment)
+            if len(self._items) >= self.max_size:
+                self.stats.shed_overflow += 1
+                if item < self._items[0]:
+                    return False
+                del self._items[0]
+            bisect.insort(self._items, item)
+            self.stats.queued = len(self._items)
+            self._condition.notify()
+            return True
+
+    def pop_batch(self, size, timeout=None):
+        """Method that returns up to size comments with the highest priority, waiting up to timeout
+        seconds for the first one. Comments that got older than the age budget while queued are shed."""
+        with self._condition:
+            if not self._items:
+                self._condition.wait(timeout)
+            now = self.clock()
+            batch = []
+            while self._items and len(batch) < size:
+                comment = self._items.pop()[2]
+                if now - comment.created_utc > self.max_age:
+                    self.stats.shed_expired += 1
+                else:
+                    batch.append(comment)
+            self.stats.queued = len(self._items)
+            return batch
+
+
+class BatchSizer:
+    """Class adapting the size of the processed batches to the measured processing time:
+    the size grows while the batches are processed within target_seconds and is halved otherwise."""
+
+    def __init__(self, minimum=None, maximum=None, target_seconds=None):
+        self.minimum = minimum or properties.MIN_BATCH_SIZE
+        self.maximum = maximum or properties.MAX_BATCH_SIZE
+        self.target_seconds = target_seconds or properties.TARGET_BATCH_SECONDS
+        self.size = self.minimum
+
+    def update(self, batch_length, seconds):
+        """Method that updates the batch size after a batch of batch_length comments
+        was processed in the given number of seconds. Returns the new size."""
+        if seconds > self.target_seconds:
+            self.size = max(self.minimum, self.size // 2)
+        elif batch_length >= self.size:
+            self.size = min(self.maximum, self.size + max(1, self.size // 4))
+        return self.size
+
+
+def save_stats(stats, filename=None):
+    """Method that saves the stats as JSON (written atomically, see dictionary_files.atomic_file)."""
+    if filename is None:
+        filename = properties.INTAKE_STATS_FILENAME
+    report = stats.as_dict()
+    report["date"] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    dictionary_files.write_atomically(filename, json.dumps(report))
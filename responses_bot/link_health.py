@@ -0,0 +1,20 @@
+"""Module used to skip the responses whose audio files no longer exist on the wiki
+(as found by responses_wiki.link_checker)."""
+
+import sqlite3
+
+__author__ = 'Jonarzz'
+
+
+DEAD_STATUSES = (404, 410)
+
+
+def load_dead_links(cursor):
+    """Method that returns a set of links found dead by the last link check
+    (empty if the links were never checked)."""
+    try:
+        cursor.execute("SELECT link FROM links WHERE status IN ({})"
+                       .format(", ".join("?" * len(DEAD_STATUSES))), DEAD_STATUSES)
+    except sqlite3.OperationalError:
+        return frozenset()
+    return frozenset(row[0] for row in cursor.fetchall())
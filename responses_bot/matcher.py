@@ -0,0 +1,50 @@
+# coding=UTF-8
+
+"""Module used to match comment bodies with the responses saved in the responses database."""
+
+from responses_bot import records
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+STRIPPED_CHARACTERS = str.maketrans("", "", "!–.,'’")
+
+
+def stripped_response(text):
+    """Method that returns the text in the form used in "stripped" column of the responses
+    database: lowercase, ellipsis as three dots, no dots, commas, apostrophes or exclamation marks."""
+    text = text.strip().lower().replace("…", "...")
+    return text.translate(STRIPPED_CHARACTERS).strip()
+
+
+def excluded_set(responses):
+    """Method that returns a set of the given excluded responses in the stripped form."""
+    return frozenset(stripped_response(response) for response in responses)
+
+
+EXCLUDED_STRIPPED = excluded_set(properties.EXCLUDED_RESPONSES)
+
+
+def load_responses(cursor, dead_links=frozenset()):
+    """Method that returns a dictionary of stripped response - compact response record
+    (see records module) loaded from the responses database. If there are several responses with
+    the same stripped text, the first one with a link not found dead by the link checker is kept."""
+    responses = {}
+    factory = records.RecordFactory()
+    cursor.execute("SELECT stripped, response, link, hero FROM responses WHERE stripped IS NOT NULL")
+    for stripped, response, link, hero in cursor:
+        if link in dead_links or stripped in responses:
+            continue
+        responses[stripped] = factory.record(response, link, hero)
+    return responses
+
+
+def find_response(responses, text, excluded=EXCLUDED_STRIPPED):
+    """Method that returns a (response, link, hero) tuple from the loaded responses for the response
+    quoted in the text or None if the text is not a known response (or is an excluded one)."""
+    stripped = stripped_response(text)
+    if stripped in excluded:
+        return None
+    record = responses.get(stripped)
+    return record.as_tuple() if record is not None else None
@@ -0,0 +1,297 @@
+"""Module used to profile the running bot on demand, without restarting it.
+
+A profile is started by a signal (SIGUSR1 - CPU, SIGUSR2 - memory) or by a command sent to the
+admin socket (e.g. `echo "cpu 30" | nc -U gwentresponses.sock`) and runs for the given number of
+seconds in a background thread:
+
+* the CPU profile samples the stacks of all the threads every PROFILE_INTERVAL_SECONDS,
+* the memory profile compares tracemalloc snapshots taken at the start and at the end.
+
+The results are saved to PROFILE_DIR, with the samples and the allocations attributed to the stage
+of the bot's pipeline (fetch, parse, match, dedupe, reply) found on the stack. Nothing is traced
+and no code is instrumented until a profile is started, so the hooks cost nothing otherwise
+(the signal, socketserver and tracemalloc modules are imported only when they are used)."""
+
+import collections
+import os
+import sys
+import threading
+import time
+
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+STAGES = ['fetch', 'parse', 'match', 'dedupe', 'reply', 'idle', 'other']
+
+# (module name prefix, function name or None for any function, stage). The innermost frame
+# of the stack matching a rule gives the stage of the sample or allocation.
+STAGE_RULES = [
+    ('gwentresponses', 'read_comments', 'fetch'),
+    ('prawcore', None, 'fetch'),
+    ('praw.models.util', 'stream_generator', 'fetch'),
+    ('praw.objector', None, 'parse'),
+    ('json', None, 'parse'),
+    ('responses_bot.matcher', None, 'match'),
+    ('responses_bot.records', None, 'match'),
+    ('responses_bot.search', None, 'match'),
+    ('responses_bot.catalog', None, 'match'),
+    ('responses_bot.dedupe', None, 'dedupe'),
+    ('responses_bot.reply', None, 'reply'),
+    ('praw.models.reddit.mixins.replyable', None, 'reply'),
+    ('threading', 'wait', 'idle'),
+    ('threading', '_wait_for_tstate_lock', 'idle'),
+]
+
+NUMBER_OF_TOP_ENTRIES = 25
+
+# Bytes written to the pipe by the signal handlers for the kinds of profiles.
+SIGNAL_KINDS = {b'c': 'cpu', b'm': 'memory'}
+
+
+def rule_stage(module, function):
+    """Method that returns the stage of the rule matching the module and function (or None)."""
+    for prefix, rule_function, stage in STAGE_RULES:
+        if (module == prefix or module.startswith(prefix + '.')) and rule_function in (None, function):
+            return stage
+    return None
+
+
+def stage_of(frames):
+    """Method that returns the stage of a stack given as (module, function) pairs from the
+    outermost to the innermost frame."""
+    for module, function in reversed(frames):
+        stage = rule_stage(module, function)
+        if stage is not None:
+            return stage
+    return 'other'
+
+
+def frame_stack(frame):
+    """Method that returns the stack of the frame as (module, function) pairs
+    from the outermost to the innermost frame."""
+    frames = []
+    while frame is not None:
+        frames.append((frame.f_globals.get('__name__', '?'), frame.f_code.co_name))
+        frame = frame.f_back
+    frames.reverse()
+    return tuple(frames)
+
+
+def modules_by_filename():
+    """Method that returns a dictionary of source file name - module name of the loaded modules."""
+    modules = {}
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, '__file__', None)
+        if filename:
+            modules[os.path.abspath(filename)] = name
+    return modules
+
+
+def traceback_stage(traceback, modules):
+    """Method that returns the stage of a tracemalloc traceback (the functions are unknown,
+    so only the rules matching any function of a module apply)."""
+    return stage_of([(modules.get(os.path.abspath(frame.filename), '?'), None)
+                     for frame in reversed(traceback)])
+
+
+class Profiler:
+    """Class running one profile at a time in a background thread and saving its report."""
+
+    def __init__(self, directory=None, interval=None):
+        self.directory = directory or properties.PROFILE_DIR
+        self.interval = interval or properties.PROFILE_INTERVAL_SECONDS
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._count = 0
+
+    @property
+    def running(self):
+        """Property telling if a profile is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, kind, seconds=None):
+        """Method that starts the CPU ('cpu') or memory ('memory') profile for the given number
+        of seconds. Returns the name of the report file or None if a profile is already running."""
+        if kind not in ('cpu', 'memory'):
+            raise ValueError("Unknown profile kind: " + repr(kind))
+        seconds = properties.PROFILE_SECONDS if seconds is None else seconds
+        with self._lock:
+            if self.running:
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            self._count += 1
+            filename = os.path.join(self.directory, '{}-{}-{}-{}.txt'.format(
+                kind, time.strftime('%Y%m%d-%H%M%S'), os.getpid(), self._count))
+            target = self.profile_cpu if kind == 'cpu' else self.profile_memory
+            self._stop.clear()
+            self._thread = threading.Thread(target=target, args=(seconds, filename),
+                                            name='profiler', daemon=True)
+            self._thread.start()
+        return filename
+
+    def stop(self):
+        """Method that ends the running profile early (its report is still saved)."""
+        self._stop.set()
+
+    def wait(self, timeout=None):
+        """Method that waits for the running profile to finish."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def profile_cpu(self, seconds, filename):
+        """Method that samples the stacks of the other threads for the given number of seconds
+        and saves the report (and the stacks in the folded format, next to it)."""
+        own_thread = threading.get_ident()
+        stacks = collections.Counter()
+        samples = 0
+        start = time.monotonic()
+        while not self._stop.is_set() and time.monotonic() - start < seconds:
+            frames = sys._current_frames()
+            for thread_id, frame in frames.items():
+                if thread_id != own_thread:
+                    stacks[frame_stack(frame)] += 1
+            del frames
+            samples += 1
+            self._stop.wait(self.interval)
+        elapsed = time.monotonic() - start
+
+        stages = collections.Counter()
+        own_samples = collections.Counter()
+        total_samples = collections.Counter()
+        for stack, count in stacks.items():
+            stages[stage_of(stack)] += count
+            if stack:
+                own_samples[stack[-1]] += count
+            for entry in set(stack):
+                total_samples[entry] += count
+
+        lines = ["CPU profile of process {}: {} samples every {} s in {:.1f} s".format(
+            os.getpid(), samples, self.interval, elapsed), ""]
+        lines += stage_lines(stages, 'samples')
+        lines += ["", "{:>8} {:>8}  function (own / total samples)".format('own', 'total')]
+        for entry, count in own_samples.most_common(NUMBER_OF_TOP_ENTRIES):
+            lines.append("{:>8} {:>8}  {}:{}".format(count, total_samples[entry], *entry))
+        write_report(filename, lines)
+        write_report(os.path.splitext(filename)[0] + '.folded',
+                     [';'.join([stage_of(stack)] + [module + ':' + function for module, function in stack])
+                      + ' ' + str(count) for stack, count in stacks.items()])
+
+    def profile_memory(self, seconds, filename):
+        """Method that traces the memory allocations for the given number of seconds
+        and saves the report of the memory allocated (and not freed) in that time."""
+        import tracemalloc
+
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start(properties.PROFILE_TRACEBACK_FRAMES)
+        ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        start = time.monotonic()
+        before = tracemalloc.take_snapshot().filter_traces(ignored)
+        self._stop.wait(seconds)
+        after = tracemalloc.take_snapshot().filter_traces(ignored)
+        elapsed = time.monotonic() - start
+        if not was_tracing:
+            tracemalloc.stop()
+
+        modules = modules_by_filename()
+        differences = after.compare_to(before, 'traceback')
+        stages = collections.Counter()
+        for difference in differences:
+            stages[traceback_stage(difference.traceback, modules)] += difference.size_diff
+
+        lines = ["Memory profile of process {}: allocations in {:.1f} s, {} bytes traced in total".format(
+            os.getpid(), elapsed, sum(statistic.size for statistic in after.statistics('filename'))), ""]
+        lines += stage_lines(stages, 'bytes')
+        for difference in differences[:NUMBER_OF_TOP_ENTRIES]:
+            lines += ["", "{} bytes ({:+d}) in {} blocks ({:+d}), stage: {}".format(
+                difference.size, difference.size_diff, difference.count, difference.count_diff,
+                traceback_stage(difference.traceback, modules))]
+            lines += difference.traceback.format(most_recent_first=True)
+        write_report(filename, lines)
+
+
+def stage_lines(stages, unit):
+    """Method that returns the report lines of the totals per pipeline stage."""
+    total = sum(stages.values()) or 1
+    lines = ["{:<8} {:>12} {:>7}".format('stage', unit, 'share')]
+    for stage in STAGES:
+        lines.append("{:<8} {:>12} {:>6.1f}%".format(stage, stages[stage], 100 * stages[stage] / total))
+    return lines
+
+
+def write_report(filename, lines):
+    """Method that saves the report lines to the file."""
+    with open(filename, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+def install_signal_handlers(profiler):
+    """Method that starts the CPU profile on SIGUSR1 and the memory profile on SIGUSR2
+    (must be called from the main thread; does nothing on systems without these signals).
+    The handlers only write the kind of the profile to a pipe and a background thread starts it:
+    the handlers run in the main thread, which may hold the profiler's lock when interrupted."""
+    import signal
+
+    if not hasattr(signal, 'SIGUSR1'):
+        return
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(write_fd, False)
+
+    def start_requested():
+        while True:
+            kind = SIGNAL_KINDS[os.read(read_fd, 1)]
+            try:
+                profiler.start(kind)
+            except Exception as error:
+                print("PROFILE ERROR: " + repr(error))
+
+    def request(kind):
+        try:
+            os.write(write_fd, kind)
+        except BlockingIOError:
+            pass
+
+    threading.Thread(target=start_requested, name='profile-signals', daemon=True).start()
+    signal.signal(signal.SIGUSR1, lambda *_: request(b'c'))
+    signal.signal(signal.SIGUSR2, lambda *_: request(b'm'))
+
+
+def admin_reply(profiler, line):
+    """Method that runs a command sent to the admin socket: "cpu [seconds]", "memory [seconds]"
+    or "stop". Returns the reply (with the name of the report file)."""
+    words = line.split()
+    try:
+        if words == ['stop']:
+            profiler.stop()
+            return "stopped"
+        if words and words[0] in ('cpu', 'memory') and len(words) <= 2:
+            filename = profiler.start(words[0], float(words[1]) if len(words) > 1 else None)
+            return "started " + filename if filename else "busy"
+        return "unknown command, use: cpu [seconds], memory [seconds] or stop"
+    except ValueError as error:
+        return "error: " + str(error)
+
+
+def start_admin_socket(profiler, path=None):
+    """Method that serves the admin socket (a Unix socket readable only by the owner) in a
+    background thread. Returns the server."""
+    import socketserver
+
+    class AdminRequestHandler(socketserver.StreamRequestHandler):
+        """Class replying to a command sent to the admin socket (see admin_reply)."""
+
+        def handle(self):
+            line = self.rfile.readline(1024).decode('UTF-8', 'replace')
+            self.wfile.write((admin_reply(profiler, line) + '\n').encode('UTF-8'))
+
+    path = path or properties.ADMIN_SOCKET_FILENAME
+    if os.path.exists(path):
+        os.remove(path)
+    server = socketserver.ThreadingUnixStreamServer(path, AdminRequestHandler)
+    os.chmod(path, 0o600)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='admin-socket', daemon=True).start()
+    return server
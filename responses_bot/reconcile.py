@@ -0,0 +1,100 @@
+"""Module used to keep the bot's replies in line with the comments they reply to.
+
+A replied comment can be edited (to another response or to something the bot would not reply to)
+or deleted after the reply was sent. The reconciler periodically checks the comments replied to in
+the last RECONCILE_DAYS: the comments are fetched in batches of up to INFO_BATCH_SIZE fullnames per
+Reddit API info call and compared with the hash of the body saved with the reply. Only for the
+changed comments the bot's replies are fetched (again in batches), the matching is run again and
+an edit or a deletion of the reply is queued, so the number of calls grows with the number of
+changed comments, not with all the replied ones."""
+
+import collections
+
+from responses_bot import dedupe
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+EDIT = 'edit'
+DELETE = 'delete'
+DELETED_BODIES = ('[deleted]', '[removed]')
+
+Action = collections.namedtuple('Action', 'kind comment_id reply text body')
+
+
+def is_deleted(comment):
+    """Method that checks if the comment was deleted (by the author or the moderators)."""
+    return comment.body in DELETED_BODIES
+
+
+def fetch_comments(reddit, comment_ids, batch_size=None):
+    """Method that returns a dictionary of comment id - comment for the given ids, fetched with one
+    info call per batch of fullnames (the comments not returned by Reddit are missing)."""
+    batch_size = batch_size or properties.INFO_BATCH_SIZE
+    comments = {}
+    for start in range(0, len(comment_ids), batch_size):
+        fullnames = ['t1_' + comment_id for comment_id in comment_ids[start:start + batch_size]]
+        for comment in reddit.info(fullnames=fullnames):
+            comments[comment.id] = comment
+    return comments
+
+
+def reconcile(reddit, cursor, catalogs, days=None, batch_size=None):
+    """Method that checks the comments replied to in the last days and returns the queue (list)
+    of actions for the replies to the changed ones: an edit with the new reply text or a deletion.
+    The comments edited without changing the reply get their body hash updated and the replies
+    deleted already are forgotten."""
+    days = properties.RECONCILE_DAYS if days is None else days
+    rows = dedupe.recent_replies(cursor, days)
+    parents = fetch_comments(reddit, [comment_id for comment_id, _, _ in rows], batch_size)
+
+    changed = []
+    for comment_id, reply_id, saved_hash in rows:
+        parent = parents.get(comment_id)
+        if parent is None or is_deleted(parent):
+            changed.append((comment_id, reply_id, None))
+        elif dedupe.body_hash(parent.body) != saved_hash:
+            changed.append((comment_id, reply_id, parent))
+    replies = fetch_comments(reddit, [reply_id for _, reply_id, _ in changed], batch_size)
+
+    actions = []
+    for comment_id, reply_id, parent in changed:
+        our_reply = replies.get(reply_id)
+        if our_reply is None or is_deleted(our_reply):
+            dedupe.forget_reply(cursor, comment_id)
+            continue
+
+        text = None
+        if parent is not None:
+            index = catalogs.index_for_subreddit(parent.subreddit.display_name)
+            if index is not None:
+                text = index.reply_text(parent.body)
+
+        if text is None:
+            actions.append(Action(DELETE, comment_id, our_reply, None, None))
+        elif text.strip() != our_reply.body.strip():
+            actions.append(Action(EDIT, comment_id, our_reply, text, parent.body))
+        else:
+            dedupe.record_reply(cursor, comment_id, reply_id, parent.body)
+    return actions
+
+
+def apply_actions(cursor, actions):
+    """Method that edits or deletes the replies as queued by reconcile and saves the changes.
+    Returns the number of actions applied (the failed ones are printed and tried again
+    on the next check)."""
+    applied = 0
+    for action in actions:
+        try:
+            if action.kind == EDIT:
+                action.reply.edit(action.text)
+                dedupe.record_reply(cursor, action.comment_id, action.reply.id, action.body)
+            else:
+                action.reply.delete()
+                dedupe.forget_reply(cursor, action.comment_id)
+        except Exception as error:
+            print("RECONCILE ERROR: " + repr(error))
+        else:
+            applied += 1
+    return applied
@@ -0,0 +1,52 @@
+"""Module used to keep the loaded responses compact in memory.
+
+Every response of the catalog is a slotted ResponseRecord instead of a tuple of fresh strings:
+the hero names are interned (one string per hero instead of one per response) and every link
+is stored as a shared URL prefix (the directory of the audio file) and the file name
+(a response without a link has None as both)."""
+
+import sys
+
+__author__ = 'Jonarzz'
+
+
+class ResponseRecord:
+    """Class holding a single response: its text, hero name and link split into
+    the shared prefix and the suffix."""
+    __slots__ = ('response', 'hero', 'link_prefix', 'link_suffix')
+
+    def __init__(self, response, hero, link_prefix, link_suffix):
+        self.response = response
+        self.hero = hero
+        self.link_prefix = link_prefix
+        self.link_suffix = link_suffix
+
+    @property
+    def link(self):
+        """Property with the full link to the response audio file (None if there is no link)."""
+        if self.link_prefix is None:
+            return None
+        return self.link_prefix + self.link_suffix
+
+    def as_tuple(self):
+        """Method that returns the (response, link, hero) tuple of the record."""
+        return self.response, self.link, self.hero
+
+
+class RecordFactory:
+    """Class creating the records of one catalog, sharing the link prefixes and hero names
+    between the records."""
+
+    def __init__(self):
+        self.prefixes = {}
+
+    def link_parts(self, link):
+        """Method that splits the link into the shared prefix (up to the last slash) and the suffix."""
+        split_index = link.rfind('/') + 1
+        prefix = link[:split_index]
+        return self.prefixes.setdefault(prefix, prefix), link[split_index:]
+
+    def record(self, response, link, hero):
+        """Method that returns the compact record of the response."""
+        link_prefix, link_suffix = (None, None) if link is None else self.link_parts(link)
+        return ResponseRecord(response, sys.intern(hero) if hero else hero, link_prefix, link_suffix)
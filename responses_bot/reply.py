@@ -0,0 +1,26 @@
+"""Module used to prepare the bot's reply comments."""
+
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+def create_reply(response, link, hero=None):
+    """Method that returns the reply text: the quoted response linked to the audio file,
+    a sound warning with the hero name (if known) and the bot's comment ending."""
+    reply = "[{}]({})".format(response, link)
+    if hero:
+        reply += " (sound warning: {})".format(hero)
+    return reply + properties.COMMENT_ENDING
+
+
+def create_search_reply(results):
+    """Method that returns the reply text for the search command: a list of the found
+    (response, link, hero) tuples and the bot's comment ending."""
+    lines = []
+    for response, link, hero in results:
+        line = "* [{}]({})".format(response, link)
+        if hero:
+            line += " ({})".format(hero)
+        lines.append(line)
+    return "\n".join(lines) + "\n" + properties.COMMENT_ENDING
@@ -0,0 +1,72 @@
+"""Module used to search the responses by keywords (the "search voice lines" command).
+
+The search uses the full text search index created by gwent_responses_database.create_search_index,
+every keyword is matched as a prefix and the results are ranked by relevance (bm25)."""
+
+import re
+import sqlite3
+
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+KEYWORD_PATTERN = re.compile(r'\w+')
+
+
+def search_query(keywords):
+    """Method that returns the FTS5 query matching all the keywords as prefixes
+    (or an empty string if there are no keywords in the text)."""
+    return ' '.join('"{}"*'.format(keyword) for keyword in KEYWORD_PATTERN.findall(keywords.lower()))
+
+
+def search_responses(cursor, keywords, hero_id=None, limit=None, dead_links=frozenset()):
+    """Method that returns a list of up to limit (response, link, hero) tuples best matching
+    the keywords, optionally only the responses of the hero with given id.
+    Responses with dead links are skipped."""
+    if limit is None:
+        limit = properties.NUMBER_OF_SEARCH_RESULTS
+    query = search_query(keywords)
+    if not query:
+        return []
+
+    sql = ("SELECT responses.response, responses.link, responses.hero FROM responses_fts "
+           "JOIN responses ON responses.id = responses_fts.rowid WHERE responses_fts MATCH ?")
+    parameters = [query]
+    if hero_id is not None:
+        sql += " AND responses.hero_id = ?"
+        parameters.append(hero_id)
+    sql += " ORDER BY responses_fts.rank LIMIT ?"
+    parameters.append(limit + len(dead_links))
+
+    try:
+        cursor.execute(sql, parameters)
+    except sqlite3.OperationalError:
+        return []
+    return [row for row in cursor.fetchall() if row[1] not in dead_links][:limit]
+
+
+def hero_id_for_name(cursor, hero_name):
+    """Method that returns the id of the hero with given name (case insensitive) or None."""
+    cursor.execute("SELECT hero_id FROM responses WHERE hero = ? COLLATE NOCASE AND hero_id IS NOT NULL "
+                   "LIMIT 1", [hero_name.strip()])
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def is_search_command(text):
+    """Method that checks if the comment text is the search command."""
+    return text.lstrip().lower().startswith(properties.SEARCH_COMMAND)
+
+
+def search_command(cursor, text, dead_links=frozenset()):
+    """Method that returns the search results for the command comment text.
+    Expected format: "<command> keywords" or "<command> hero name: keywords"."""
+    text = text.lstrip()[len(properties.SEARCH_COMMAND):].strip()
+    hero_id = None
+    if ':' in text:
+        hero_name, text = text.split(':', 1)
+        hero_id = hero_id_for_name(cursor, hero_name)
+        if hero_id is None:
+            return []
+    return search_responses(cursor, text, hero_id, dead_links=dead_links)
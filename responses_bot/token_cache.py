@@ -0,0 +1,120 @@
+"""Module used to share the Reddit API access token between the bot processes and restarts.
+
+The access token, its scopes and its expiry time are cached in a JSON file. A process that needs
+a token reads it from the file and refreshes it only when the cached one is about to expire
+(margin seconds before the expiry, so the requests never run with an expired token). Refreshing is
+done under an exclusive lock of the file, so when several workers need a new token at the same
+time only the first one asks Reddit for it and the others read it from the cache."""
+
+import contextlib
+import json
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from responses_wiki import dictionary_files
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+class TokenCache:
+    """Class describing the access token cache file. The key identifies the application and the
+    account (the tokens cached for other keys are ignored)."""
+
+    def __init__(self, key, filename=None, margin=None, clock=time.time):
+        self.key = key
+        self.filename = filename or properties.TOKEN_CACHE_FILENAME
+        self.margin = properties.TOKEN_REFRESH_MARGIN_SECONDS if margin is None else margin
+        self.clock = clock
+
+    def is_fresh(self, entry):
+        """Method that checks if the cached entry can still be used (and does not have to be refreshed yet)."""
+        return entry is not None and entry['expires_at'] - self.margin > self.clock()
+
+    def load(self):
+        """Method that returns the cached entry (access_token, expires_at, scopes)
+        or None if there is no fresh token for the key."""
+        try:
+            with open(self.filename) as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get('key') != self.key:
+            return None
+        return entry if self.is_fresh(entry) else None
+
+    def save(self, access_token, expires_at, scopes):
+        """Method that saves the token in the cache (readable only by the owner, written atomically,
+        see dictionary_files.atomic_file). Returns the entry."""
+        entry = {'key': self.key, 'access_token': access_token, 'expires_at': expires_at,
+                 'scopes': sorted(scopes)}
+        dictionary_files.write_atomically(self.filename, json.dumps(entry), 0o600)
+        return entry
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Context manager holding the exclusive lock of the cache (shared by all the processes)."""
+        with open(self.filename + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, refresh, stale_token=None):
+        """Method that returns a fresh cached entry, calling refresh (returning the access token,
+        its expiry time and scopes) only if no other process has cached a fresh token.
+        The stale_token (rejected by Reddit) is never returned."""
+        entry = self.load()
+        if entry is not None and entry['access_token'] != stale_token:
+            return entry
+        with self.locked():
+            entry = self.load()
+            if entry is None or entry['access_token'] == stale_token:
+                entry = self.save(*refresh())
+        return entry
+
+
+def expires_at(authorizer):
+    """Method that returns the expiry time (epoch seconds) of the prawcore authorizer's token."""
+    if getattr(authorizer, '_expiration_timestamp_ns', None) is not None:
+        return time.time() + (authorizer._expiration_timestamp_ns - time.monotonic_ns()) / 1e9
+    return authorizer._expiration_timestamp
+
+
+def install_token(authorizer, entry):
+    """Method that sets the cached token on the prawcore authorizer."""
+    authorizer.access_token = entry['access_token']
+    authorizer.scopes = set(entry['scopes'])
+    authorizer._expiration_timestamp = entry['expires_at']
+    authorizer._expiration_timestamp_ns = time.monotonic_ns() + int((entry['expires_at'] - time.time()) * 1e9)
+
+
+def use_token_cache(authorizer, cache):
+    """Method that makes the prawcore authorizer take its tokens from the cache: the token is
+    refreshed through the cache (only when no other process cached a fresh one) and is treated
+    as invalid margin seconds before it expires, so it is refreshed proactively."""
+    refresh = authorizer.refresh
+    current = {}
+
+    def fetch():
+        refresh()
+        return authorizer.access_token, expires_at(authorizer), authorizer.scopes or ()
+
+    def cached_refresh():
+        stale_token = current['entry']['access_token'] if current and authorizer.access_token is None else None
+        current['entry'] = cache.get(fetch, stale_token)
+        install_token(authorizer, current['entry'])
+
+    def is_valid():
+        return authorizer.access_token is not None and cache.is_fresh(current.get('entry'))
+
+    authorizer.refresh = cached_refresh
+    authorizer.is_valid = is_valid
+    return authorizer
@@ -0,0 +1,158 @@
+# coding=UTF-8
+
+"""Module used to save and load the dictionaries generated from the wiki (responses, heroes,
+"shitty wizard" responses).
+
+The files are written atomically (see atomic_file, also used for the other files read while
+they may be rewritten), so a crash never leaves a truncated file, and the entries are streamed
+to the file instead of being collected in memory first. Next to JSON, a compact binary format is
+supported, which is much faster to load:
+
+    4 bytes  magic (b'GRD1')
+    4 bytes  number of entries (unsigned, little endian)
+    4 bytes  length of the keys block in bytes (unsigned, little endian)
+    keys block: UTF-8 keys separated by NUL characters
+    values block: UTF-8 values separated by NUL characters
+
+Loading is a single split of each block, done in C, instead of parsing JSON."""
+
+import contextlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+__author__ = 'Jonarzz'
+
+
+MAGIC = b'GRD1'
+HEADER = struct.Struct('<4sII')
+SEPARATOR = '\0'
+
+
+@contextlib.contextmanager
+def atomic_file(filename, permissions=0o644):
+    """Context manager yielding a temporary binary file in the directory of the file, which replaces
+    the file only if the block finishes without errors. The temporary file is readable only by the
+    owner until it gets the permissions, and it is synced to the disk before the rename, so neither
+    the readers nor a crash ever see a partial file."""
+    directory = os.path.dirname(os.path.abspath(filename))
+    file = tempfile.NamedTemporaryFile(mode='wb', dir=directory, delete=False,
+                                       prefix=os.path.basename(filename) + '.', suffix='.tmp')
+    try:
+        with file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(file.name, permissions)
+        os.replace(file.name, filename)
+    finally:
+        if os.path.exists(file.name):
+            os.remove(file.name)
+
+
+def write_atomically(filename, text, permissions=0o644):
+    """Method that replaces the file with the text (UTF-8) atomically (see atomic_file)."""
+    with atomic_file(filename, permissions) as file:
+        file.write(text.encode('UTF-8'))
+
+
+class DictionaryWriter:
+    """Class streaming the entries of a string - string dictionary to a file (JSON or binary).
+    Used as a context manager: the file is replaced only if the block finishes without errors."""
+
+    def __init__(self, filename, binary=False):
+        self.filename = filename
+        self.binary = binary
+        self.count = 0
+        self._stack = None
+        self._file = None
+        self._values = None
+        self._keys_length = 0
+
+    def __enter__(self):
+        self._stack = contextlib.ExitStack()
+        self._file = self._stack.enter_context(atomic_file(self.filename))
+        if self.binary:
+            self._file.write(HEADER.pack(MAGIC, 0, 0))
+            self._values = self._stack.enter_context(tempfile.TemporaryFile())
+        else:
+            self._file.write(b'{')
+        return self
+
+    def add(self, key, value):
+        """Method that writes the entry to the file (the keys must be strings, as the keys
+        of a JSON object; so must be the values in the binary format)."""
+        if not isinstance(key, str):
+            raise TypeError("Only string keys can be saved: " + repr(key))
+        if self.binary:
+            if not isinstance(value, str):
+                raise TypeError("Only string values can be saved in the binary format")
+            if SEPARATOR in key or SEPARATOR in value:
+                raise ValueError("NUL character in the entry: " + repr(key))
+            key_bytes = (SEPARATOR + key if self.count else key).encode('UTF-8')
+            self._file.write(key_bytes)
+            self._keys_length += len(key_bytes)
+            self._values.write((SEPARATOR + value if self.count else value).encode('UTF-8'))
+        else:
+            entry = json.dumps(key) + ': ' + json.dumps(value)
+            self._file.write(((', ' if self.count else '') + entry).encode('UTF-8'))
+        self.count += 1
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            return self._stack.__exit__(exc_type, exc_value, traceback)
+        with self._stack:
+            if self.binary:
+                self._values.seek(0)
+                shutil.copyfileobj(self._values, self._file)
+                self._file.seek(0)
+                self._file.write(HEADER.pack(MAGIC, self.count, self._keys_length))
+            else:
+                self._file.write(b'}')
+        return False
+
+
+def save_dictionary(filename, items, binary=False):
+    """Method that saves the (key, value) pairs (or a dictionary) to the file atomically."""
+    if isinstance(items, dict):
+        items = items.items()
+    with DictionaryWriter(filename, binary) as writer:
+        for key, value in items:
+            writer.add(key, value)
+    return writer.count
+
+
+def is_binary_file(filename):
+    """Method that checks if the file is saved in the binary format."""
+    with open(filename, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def load_binary_dictionary(filename):
+    """Method that loads a dictionary saved in the binary format."""
+    with open(filename, 'rb') as file:
+        header = file.read(HEADER.size)
+        data = file.read()
+    if len(header) < HEADER.size:
+        raise ValueError("Truncated dictionary file: " + filename)
+    magic, count, keys_length = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Not a binary dictionary file: " + filename)
+    if count == 0:
+        return {}
+
+    keys = data[:keys_length].decode('UTF-8').split(SEPARATOR)
+    values = data[keys_length:].decode('UTF-8').split(SEPARATOR)
+    if len(keys) != count or len(values) != count:
+        raise ValueError("Corrupted dictionary file: " + filename)
+    return dict(zip(keys, values))
+
+
+def load_dictionary(filename):
+    """Method that loads a dictionary saved in the binary or JSON format."""
+    if is_binary_file(filename):
+        return load_binary_dictionary(filename)
+    with open(filename, encoding='UTF-8') as file:
+        return json.load(file)
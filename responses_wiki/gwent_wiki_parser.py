@@ -7,11 +7,9 @@ Responses and urls to responses as mp3s are parsed from gwent 2 Wiki: http://gwe
 import os
 import re
 import json
-from urllib.request import Request, urlopen
-from urllib import parse
-
-from bs4 import BeautifulSoup
+import sqlite3
 
+from responses_wiki import dictionary_files, rebuild_jobs
 import gwent_responses_properties as properties
 
 __author__ = 'Jonarzz'
@@ -24,27 +22,68 @@ CATEGORY = 'Audio'
 SCRIPT_DIR = os.path.dirname(__file__)
 
 
-def generate_dictionaries(responses_filename, heroes_filename, shitty_wizard_filename):
+def generate_dictionaries(responses_filename, heroes_filename, shitty_wizard_filename, binary=False,
+                          category=CATEGORY, url_beginning=URL_BEGINNING):
     """Method used to generate dictionaries for responses and hero names
-    (short, used in urls matched with full names)."""
-    responses, heroes, shitty_wizard = dictionary_of_responses(pages_for_category(CATEGORY))
-    json.dump(responses, open(os.path.join(SCRIPT_DIR, responses_filename), "w"))
-    json.dump(heroes, open(os.path.join(SCRIPT_DIR, heroes_filename), "w"))
-    json.dump(shitty_wizard, open(os.path.join(SCRIPT_DIR, shitty_wizard_filename), "w"))
+    (short, used in urls matched with full names).
+
+    The pages are parsed as a rebuild job (see rebuild_jobs module): the entries of every page are
+    staged in the rebuild database together with its checkpoint, so a run that died halfway is
+    resumed from the first unfinished page. When all the pages are parsed, the entries are streamed
+    to the files and every file is replaced atomically (see dictionary_files module), in JSON or in
+    the binary format."""
+    seen_responses = set()
+    seen_heroes = set()
+    seen_shitty_wizard = set()
+    job_name = 'dictionaries:' + url_beginning + category
+
+    connection = sqlite3.connect(os.path.join(SCRIPT_DIR, properties.REBUILD_DB_FILENAME))
+    connection.execute('CREATE TABLE IF NOT EXISTS rebuild_entries (job text, ending text, number integer, '
+                       'key text, value text, hero text)')
+    connection.execute('CREATE INDEX IF NOT EXISTS rebuild_entries_page ON rebuild_entries (job, ending)')
+
+    def save_page(cursor, ending, rows):
+        cursor.execute("DELETE FROM rebuild_entries WHERE job=? AND ending=?", (job_name, ending))
+        cursor.executemany("INSERT INTO rebuild_entries VALUES (?, ?, ?, ?, ?, ?)",
+                           [(job_name, ending, number) + tuple(row) for number, row in enumerate(rows)])
+
+    def remove_page(cursor, ending):
+        if ending is not None:
+            cursor.execute("DELETE FROM rebuild_entries WHERE job=? AND ending=?", (job_name, ending))
+
+    rebuild_jobs.run_pages(connection, job_name, lambda: pages_for_category(category, url_beginning),
+                           lambda ending: page_entries(ending, url_beginning), save_page, remove_page)
+    entries = connection.execute("SELECT key, value, hero FROM rebuild_entries JOIN rebuild_pages "
+                                 "USING (job, ending) WHERE job=? AND position IS NOT NULL "
+                                 "ORDER BY position, number", (job_name,))
+
+    with dictionary_files.DictionaryWriter(os.path.join(SCRIPT_DIR, responses_filename), binary) as responses, \
+            dictionary_files.DictionaryWriter(os.path.join(SCRIPT_DIR, heroes_filename), binary) as heroes, \
+            dictionary_files.DictionaryWriter(os.path.join(SCRIPT_DIR, shitty_wizard_filename), binary) as shitty_wizard:
+        for key, value, hero in entries:
+            if hero not in seen_heroes:
+                seen_heroes.add(hero)
+                heroes.add(hero, hero)
+            if key == "shitty wizard":
+                if hero not in seen_shitty_wizard:
+                    seen_shitty_wizard.add(hero)
+                    shitty_wizard.add(hero, value)
+            elif key not in seen_responses:
+                seen_responses.add(key)
+                responses.add(key, value)
+    connection.close()
 
 
 def dictionary_from_file(filename):
-    """Method used to load a dictionary from text file with given name
-    (file contains JSON structure)."""
-    with open(os.path.join(SCRIPT_DIR, filename)) as file:
-        dictionary = json.load(file)
-        return dictionary
+    """Method used to load a dictionary from file with given name
+    (file contains JSON structure or the binary format of dictionary_files module)."""
+    return dictionary_files.load_dictionary(os.path.join(SCRIPT_DIR, filename))
 
 
-def create_responses_dict(ending):
+def create_responses_dict(ending, url_beginning=URL_BEGINNING):
     """Method that for a given page ending creates a dictionary of pairs: response text-link."""
     responses_dict = {}
-    list_of_responses = create_list_of_responses(ending)
+    list_of_responses = create_list_of_responses(ending, url_beginning)
     for element in list_of_responses:
         key = response_text_from_element(element)
         if " " not in key:
@@ -57,7 +96,27 @@ def create_responses_dict(ending):
 
     return responses_dict
 
-def dictionary_of_responses(category):
+def page_entries(ending, url_beginning=URL_BEGINNING):
+    """Method that returns a list of (response text, link, short hero name) for every response
+    found on the page with given ending (skipping the one-word responses)."""
+    entries = []
+    for element in create_list_of_responses(ending, url_beginning):
+        key = response_text_from_element(element)
+        if " " not in key:
+            continue
+        entries.append((key, value_from_element(element), short_hero_name_from_url(element)))
+    return entries
+
+
+def response_entries(category, url_beginning=URL_BEGINNING):
+    """Generator yielding (response text, link, short hero name) for every response
+    found on the pages with given endings (skipping the one-word responses)."""
+    for ending in category:
+        print(ending)
+        yield from page_entries(ending, url_beginning)
+
+
+def dictionary_of_responses(category, url_beginning=URL_BEGINNING):
     """Method that creates dictionaries - with the responses (response text - link to the file),
     with hero names (short hero name used in Wiki files - long hero names),
     with "shitty wizard" responses (hero name - link to the file).
@@ -69,31 +128,25 @@ def dictionary_of_responses(category):
     heroes = {}
     shitty_wizard = {}
 
-    for ending in category:
-        print(ending)
-        list_of_responses = create_list_of_responses(ending)
-        for element in list_of_responses:
-            key = response_text_from_element(element)
-            if " " not in key:
-                continue
-            value = value_from_element(element)
-            short_hero = short_hero_name_from_url(element)
-            hero = short_hero
-            if short_hero not in heroes:
-                heroes[short_hero] = hero
-            if key == "shitty wizard":
-                if hero not in shitty_wizard:
-                    shitty_wizard[hero] = value
-            else:
-                if key not in responses:
-                    responses[key] = value
+    for key, value, short_hero in response_entries(category, url_beginning):
+        hero = short_hero
+        if short_hero not in heroes:
+            heroes[short_hero] = hero
+        if key == "shitty wizard":
+            if hero not in shitty_wizard:
+                shitty_wizard[hero] = value
+        else:
+            if key not in responses:
+                responses[key] = value
     return responses, heroes, shitty_wizard
 
 
-def create_list_of_responses(ending):
+def create_list_of_responses(ending, url_beginning=URL_BEGINNING):
     """ Grabs comment data from wiki. This isn't used currently."""
-    page_to_parse(URL_BEGINNING + ending)
-    page = page_to_parse(URL_BEGINNING + ending)
+    from bs4 import BeautifulSoup
+
+    page_to_parse(url_beginning + ending)
+    page = page_to_parse(url_beginning + ending)
     soup = BeautifulSoup(page, "html.parser")
     list_of_responses = []
     for element in soup.find_all("div", {"class" : "fullMedia"}):
@@ -104,6 +157,9 @@ def create_list_of_responses(ending):
 
 def page_to_parse(url):
     """Method used to open given url and return the received body (UTF-8 encoding)."""
+    from urllib.request import Request, urlopen
+    from urllib import parse
+
     scheme, netloc, path, query, fragment = parse.urlsplit(url)
     path = parse.quote(path)
     url = parse.urlunsplit((scheme, netloc, path, query, fragment))
@@ -113,14 +169,14 @@ def page_to_parse(url):
     return response.read().decode("UTF-8")
 
 
-def pages_for_category(category_name):
+def pages_for_category(category_name, url_beginning=URL_BEGINNING):
     """Method that returns a list of page endings for a given Wiki category."""
     category_name = category_name.replace(" ", "_")
     continue_code = ""
     continue_bool = 1
     output = []
     while continue_bool == 1:
-        json_response = page_to_parse(URL_BEGINNING + URL_START+ continue_code + URL_END + category_name)
+        json_response = page_to_parse(url_beginning + URL_START+ continue_code + URL_END + category_name)
 
         parsed_json = json.loads(json_response)
         for categorymembers in parsed_json["query"]["categorymembers"]:
@@ -0,0 +1,156 @@
+# coding=UTF-8
+
+"""Module used to check if the links to the responses audio files saved in the responses database
+still work (wiki files get renamed or deleted).
+
+Every link is checked with a HEAD request (conditional, if the ETag is known) by a bounded pool of
+threads, each of them reusing its connections to the wiki hosts. The status, ETag and date of the
+check are cached in "links" table, so that only the links not checked for a number of days defined
+in the properties file are checked again."""
+
+import datetime
+import http.client
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib import parse
+
+from responses_bot import catalog, link_health
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+USER_AGENT = 'Mozilla/5.0'
+TIMEOUT = 10
+
+
+def create_links_table(cursor):
+    """Method that creates the table with the cached link check results."""
+    cursor.execute('CREATE TABLE IF NOT EXISTS links (link text primary key, status integer, '
+                   'etag text, checked date)')
+
+
+def stale_links(cursor, max_age_days=None):
+    """Method that returns a list of (link, etag) pairs for the response links
+    that were never checked or were checked more than max_age_days ago."""
+    if max_age_days is None:
+        max_age_days = properties.NUMBER_OF_DAYS_TO_RECHECK_LINK
+    furthest_date = datetime.date.today() - datetime.timedelta(days=max_age_days)
+    cursor.execute("SELECT DISTINCT responses.link, links.etag FROM responses "
+                   "LEFT JOIN links ON links.link = responses.link "
+                   "WHERE responses.link IS NOT NULL AND (links.checked IS NULL OR links.checked <= ?)",
+                   [str(furthest_date)])
+    return cursor.fetchall()
+
+
+class HostConnections:
+    """Class holding the connections of every thread to the wiki hosts (a thread reuses its own
+    connection to a host), so that all of them can be closed when the checks are done."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.opened = []
+
+    def get(self, scheme, netloc):
+        """Method that returns the connection of the current thread to the given host
+        (a new one is opened only if the thread has none yet)."""
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        if (scheme, netloc) not in connections:
+            connection_class = (http.client.HTTPSConnection if scheme == 'https'
+                                else http.client.HTTPConnection)
+            connections[(scheme, netloc)] = connection_class(netloc, timeout=TIMEOUT)
+            with self._lock:
+                self.opened.append(connections[(scheme, netloc)])
+        return connections[(scheme, netloc)]
+
+    def drop(self, scheme, netloc):
+        """Method that closes and forgets the connection of the current thread to the given host."""
+        connection = self._local.connections.pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def close(self):
+        """Method that closes the connections of all the threads."""
+        with self._lock:
+            for connection in self.opened:
+                connection.close()
+            self.opened = []
+
+
+_connections = HostConnections()
+
+
+def check_link(link, etag=None, connections=None):
+    """Method that sends a HEAD request for the link (over the connections of the current thread,
+    see HostConnections) and returns a (link, status, etag) tuple. A 304 response to the conditional
+    request keeps the known ETag. The status is None if the request failed twice (e.g. a network error)."""
+    if connections is None:
+        connections = _connections
+    scheme, netloc, path, query, _ = parse.urlsplit(link)
+    target = parse.quote(path, safe='/%') + ('?' + query if query else '')
+    headers = {"User-Agent": USER_AGENT}
+    if etag:
+        headers["If-None-Match"] = etag
+
+    for _ in range(2):
+        connection = connections.get(scheme, netloc)
+        try:
+            connection.request('HEAD', target, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            connections.drop(scheme, netloc)
+            continue
+        if response.will_close:
+            connections.drop(scheme, netloc)
+        return link, response.status, response.getheader('ETag') or etag
+    return link, None, etag
+
+
+def save_results(cursor, results):
+    """Method that saves the (link, status, etag) results of the checks with today's date.
+    Failed checks (no status) are not saved, so the links are checked again next time."""
+    cursor.executemany("INSERT OR REPLACE INTO links VALUES (?, ?, ?, ?)",
+                       [(link, status, etag, datetime.date.today())
+                        for link, status, etag in results if status is not None])
+
+
+def check_links(max_age_days=None, workers=None, batch_size=100, game=None):
+    """Method that checks all the stale links from the responses database of the game with bounded
+    concurrency (at most batch_size links are submitted at once) and saves the results after every
+    batch. Returns the number of checked links and the number of dead links."""
+    if workers is None:
+        workers = properties.LINK_CHECK_WORKERS
+
+    conn = sqlite3.connect(catalog.game_settings(game)['responses_db'])
+    curse = conn.cursor()
+    create_links_table(curse)
+    links = stale_links(curse, max_age_days)
+
+    checked = 0
+    dead = 0
+    connections = HostConnections()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(links), batch_size):
+                batch = list(executor.map(lambda pair: check_link(*pair, connections=connections),
+                                          links[start:start + batch_size]))
+                checked += len(batch)
+                dead += sum(1 for _, status, _ in batch if status in link_health.DEAD_STATUSES)
+                save_results(curse, batch)
+                conn.commit()
+    finally:
+        connections.close()
+    curse.close()
+
+    print("LINKS CHECKED: " + str(checked) + "\nDead links: " + str(dead))
+    return checked, dead
+
+
+if __name__ == '__main__':
+    for game_name in properties.GAMES:
+        check_links(game=game_name)
@@ -0,0 +1,146 @@
+# coding=UTF-8
+
+"""Module used to rebuild data from the wiki page by page, so that a rebuild that died halfway
+(a network error, a crash) resumes where it stopped instead of starting over.
+
+Every rebuild is a job with a row per page (ending) in the rebuild_pages table: its position in the
+category, its status and the content hash of its parsed rows. The rows of a page and its
+checkpoint are committed in one transaction, so after a crash every page is either fully saved
+and marked done or not saved at all. The next run of an unfinished job parses only the pages that
+are not done (without listing the category again). A new run of a finished job checks all the
+pages again, but writes only the pages whose content hash changed. The pages no longer listed
+are removed (with their rows) when the run finishes."""
+
+import datetime
+import hashlib
+import json
+import time
+
+__author__ = 'Jonarzz'
+
+
+PENDING = 'pending'
+DONE = 'done'
+RUNNING = 'running'
+FINISHED = 'finished'
+
+
+def create_rebuild_tables(cursor):
+    """Method that creates the tables of the rebuild jobs and their pages."""
+    cursor.execute('CREATE TABLE IF NOT EXISTS rebuild_jobs (job text primary key, status text, '
+                   'started timestamp, finished timestamp)')
+    cursor.execute('CREATE TABLE IF NOT EXISTS rebuild_pages (job text, ending text, position integer, '
+                   'status text, content_hash text, rows integer, checked timestamp, primary key (job, ending))')
+
+
+def content_hash(rows):
+    """Method that returns the hash of the parsed rows of a page."""
+    return hashlib.sha256(json.dumps(rows, ensure_ascii=False).encode('UTF-8')).hexdigest()
+
+
+def format_progress(done, total, elapsed, processed):
+    """Method that returns the progress line: pages done, percentage and the ETA estimated
+    from the average time of the pages processed in this run."""
+    line = "[{}/{}] {:.1f}%".format(done, total, 100 * done / total if total else 100)
+    if processed:
+        eta = elapsed / processed * (total - done)
+        line += " ETA " + str(datetime.timedelta(seconds=round(eta)))
+    return line
+
+
+class RebuildJob:
+    """Class describing the state of a rebuild job saved in the database of the connection."""
+
+    def __init__(self, connection, name):
+        self.connection = connection
+        self.name = name
+        self.cursor = connection.cursor()
+        create_rebuild_tables(self.cursor)
+        self.connection.commit()
+
+    def status(self):
+        """Method that returns the status of the job (None if it was never started)."""
+        self.cursor.execute("SELECT status FROM rebuild_jobs WHERE job=?", (self.name,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def start(self, list_endings):
+        """Method that starts a new run of the job with the endings returned by list_endings
+        (called only if the job is not resumed). Returns the endings left to parse, in order,
+        and the number of pages of the run."""
+        if self.status() != RUNNING:
+            endings = list_endings()
+            with self.connection:
+                self.cursor.execute("INSERT OR REPLACE INTO rebuild_jobs VALUES (?, ?, ?, NULL)",
+                                    (self.name, RUNNING, datetime.datetime.now()))
+                self.cursor.execute("UPDATE rebuild_pages SET position=NULL WHERE job=?", (self.name,))
+                self.cursor.executemany(
+                    "INSERT INTO rebuild_pages(job, ending, position, status) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(job, ending) DO UPDATE SET position=excluded.position, status=excluded.status",
+                    [(self.name, ending, position, PENDING) for position, ending in enumerate(endings)])
+
+        self.cursor.execute("SELECT ending, status FROM rebuild_pages WHERE job=? AND position IS NOT NULL "
+                            "ORDER BY position", (self.name,))
+        pages = self.cursor.fetchall()
+        return [ending for ending, status in pages if status != DONE], len(pages)
+
+    def saved_hash(self, ending):
+        """Method that returns the content hash of the rows of the page saved before (or None)."""
+        self.cursor.execute("SELECT content_hash FROM rebuild_pages WHERE job=? AND ending=?",
+                            (self.name, ending))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def checkpoint(self, ending, page_hash, rows):
+        """Method that marks the page as done (in the transaction of its rows)."""
+        self.cursor.execute("UPDATE rebuild_pages SET status=?, content_hash=?, rows=?, checked=? "
+                            "WHERE job=? AND ending=?",
+                            (DONE, page_hash, rows, datetime.datetime.now(), self.name, ending))
+
+    def finish(self, remove_page=None):
+        """Method that marks the run of the job as finished and removes the pages not listed
+        in this run. If remove_page is given, it is called as remove_page(cursor, ending) to remove
+        the rows of every such page and as remove_page(cursor, None) for the rows saved without
+        a page. Returns the number of pages removed."""
+        with self.connection:
+            self.cursor.execute("SELECT ending FROM rebuild_pages WHERE job=? AND position IS NULL", (self.name,))
+            removed = [row[0] for row in self.cursor.fetchall()]
+            if remove_page is not None:
+                for ending in removed + [None]:
+                    remove_page(self.connection.cursor(), ending)
+            self.cursor.execute("DELETE FROM rebuild_pages WHERE job=? AND position IS NULL", (self.name,))
+            self.cursor.execute("UPDATE rebuild_jobs SET status=?, finished=? WHERE job=?",
+                                (FINISHED, datetime.datetime.now(), self.name))
+        return len(removed)
+
+
+def run_pages(connection, name, list_endings, parse_page, save_page, remove_page=None, clock=time.monotonic):
+    """Method that runs (or resumes) the rebuild job: every page left is parsed with parse_page
+    (returning a list of rows) and, if its content changed, saved with save_page(cursor, ending, rows)
+    in the same transaction as its checkpoint. Prints the progress with an ETA. When the job finishes,
+    the rows of the pages no longer listed are removed with remove_page (see RebuildJob.finish).
+    Returns the number of pages parsed and saved in this run."""
+    job = RebuildJob(connection, name)
+    endings, total = job.start(list_endings)
+    done = total - len(endings)
+    if done:
+        print("Resuming " + name + " after " + str(done) + " pages")
+
+    start = clock()
+    parsed = saved = 0
+    for ending in endings:
+        rows = parse_page(ending)
+        page_hash = content_hash(rows)
+        with connection:
+            if job.saved_hash(ending) != page_hash:
+                save_page(connection.cursor(), ending, rows)
+                saved += 1
+            job.checkpoint(ending, page_hash, len(rows))
+        parsed += 1
+        done += 1
+        print(format_progress(done, total, clock() - start, parsed) + " " + ending)
+
+    removed = job.finish(remove_page)
+    if removed:
+        print("Removed " + str(removed) + " pages no longer listed")
+    return parsed, saved
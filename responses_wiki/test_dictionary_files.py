@@ -0,0 +1,120 @@
+# coding=UTF-8
+
+"""Module used to test dictionary_files module methods."""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks import synthetic_data
+from responses_wiki import dictionary_files
+from responses_wiki import gwent_wiki_parser as parser
+
+__author__ = 'Jonarzz'
+
+
+class DictionaryFilesTest(unittest.TestCase):
+    """Class used to test dictionary_files module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.work_dir.name, 'responses.txt')
+        self.dictionary = {"fancy a game of gwent?": "http://a.a/Geralt.mp3",
+                           "zażółć…": "http://a.a/Ciri.mp3", 'quote " and \\': ""}
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_round_trip(self):
+        """Method testing that the saved dictionaries are loaded back in both formats."""
+        for binary in (False, True):
+            self.assertEqual(dictionary_files.save_dictionary(self.filename, self.dictionary, binary), 3)
+            self.assertEqual(dictionary_files.is_binary_file(self.filename), binary)
+            self.assertEqual(dictionary_files.load_dictionary(self.filename), self.dictionary)
+
+            dictionary_files.save_dictionary(self.filename, {}, binary)
+            self.assertEqual(dictionary_files.load_dictionary(self.filename), {})
+
+        dictionary_files.save_dictionary(self.filename, self.dictionary)
+        with open(self.filename) as file:
+            self.assertEqual(json.load(file), self.dictionary)
+
+    def test_atomic_write(self):
+        """Method testing that a failed write keeps the old file and leaves no temporary files."""
+        dictionary_files.save_dictionary(self.filename, self.dictionary, binary=True)
+
+        def entries():
+            yield "a b", "c"
+            raise RuntimeError("crash")
+
+        for binary in (False, True):
+            with self.assertRaises(RuntimeError):
+                dictionary_files.save_dictionary(self.filename, entries(), binary)
+            self.assertEqual(dictionary_files.load_dictionary(self.filename), self.dictionary)
+        self.assertEqual(os.listdir(self.work_dir.name), ['responses.txt'])
+
+    def test_write_atomically(self):
+        """Method testing that the file is replaced with the given permissions and that a failed
+        write keeps the old file and leaves no temporary files."""
+        dictionary_files.write_atomically(self.filename, "zażółć", 0o600)
+        self.assertEqual(os.stat(self.filename).st_mode & 0o777, 0o600)
+        with self.assertRaises(RuntimeError):
+            with dictionary_files.atomic_file(self.filename) as file:
+                file.write(b"partial")
+                raise RuntimeError("crash")
+        with open(self.filename, encoding='UTF-8') as file:
+            self.assertEqual(file.read(), "zażółć")
+        self.assertEqual(os.listdir(self.work_dir.name), ['responses.txt'])
+
+    def test_non_string_keys(self):
+        """Method testing that the entries with keys other than strings are rejected in both formats
+        (and the old file is kept), as a JSON object with such keys could not be loaded."""
+        dictionary_files.save_dictionary(self.filename, self.dictionary)
+        for binary in (False, True):
+            for key in (1, None, ("a", "b")):
+                with self.assertRaises(TypeError):
+                    dictionary_files.save_dictionary(self.filename, {key: "a"}, binary)
+            self.assertEqual(dictionary_files.load_dictionary(self.filename), self.dictionary)
+        self.assertEqual(os.listdir(self.work_dir.name), ['responses.txt'])
+
+    def test_binary_format_errors(self):
+        """Method testing that the unsupported entries and corrupted files are rejected."""
+        with self.assertRaises(ValueError):
+            dictionary_files.save_dictionary(self.filename, {"a\0b": "c"}, binary=True)
+        with self.assertRaises(TypeError):
+            dictionary_files.save_dictionary(self.filename, {"a": 1}, binary=True)
+
+        dictionary_files.save_dictionary(self.filename, self.dictionary, binary=True)
+        with open(self.filename, 'rb') as file:
+            data = file.read()
+        with open(self.filename, 'wb') as file:
+            file.write(data[:-10].replace(b'\0', b'', 1))
+        with self.assertRaises(ValueError):
+            dictionary_files.load_dictionary(self.filename)
+
+    def test_generate_dictionaries(self):
+        """Method testing generate_dictionaries method from gwent_wiki_parser module."""
+        pairs = synthetic_data.responses(20) + [("Geralt", "Shitty wizard")]
+        listings = synthetic_data.category_listings(['File:' + str(index) for index in range(3)])
+        pages = [synthetic_data.full_media_page(pairs[:10]), synthetic_data.full_media_page(pairs[10:]),
+                 synthetic_data.full_media_page(pairs[:5])]
+
+        with mock.patch.object(parser, 'SCRIPT_DIR', self.work_dir.name), \
+                mock.patch.object(parser, 'page_to_parse', side_effect=listings + [page for page in pages
+                                                                                for _ in range(2)]), \
+                mock.patch('builtins.print'):
+            parser.generate_dictionaries('responses.bin', 'heroes.bin', 'wizard.bin', binary=True)
+            responses = parser.dictionary_from_file('responses.bin')
+            heroes = parser.dictionary_from_file('heroes.bin')
+            wizard = parser.dictionary_from_file('wizard.bin')
+
+        self.assertEqual(len(responses), 20)
+        self.assertEqual(set(heroes), {hero for hero, _ in pairs})
+        self.assertEqual(list(wizard), ["Geralt"])
+
+
+if __name__ == '__main__':
+    unittest.main()
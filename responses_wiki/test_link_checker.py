@@ -0,0 +1,154 @@
+"""Module used to test link_checker module methods."""
+
+import datetime
+import http.server
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from responses_bot import catalog, link_health
+from responses_wiki import link_checker
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+class MediaHandler(http.server.BaseHTTPRequestHandler):
+    """Class answering HEAD requests like the wiki media server: existing files have an ETag,
+    a matching If-None-Match gives 304 and the deleted files give 404."""
+    protocol_version = 'HTTP/1.1'
+    files = {'/Geralt.mp3': '"abc"', '/Ciri.mp3': '"def"'}
+    requests = []
+
+    def do_HEAD(self):
+        """Method answering the HEAD request."""
+        self.requests.append((self.path, self.headers.get('If-None-Match'),
+                              self.client_address[1]))
+        etag = self.files.get(self.path)
+        if etag is None:
+            self.send_response(404)
+        elif self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class LinkCheckerTest(unittest.TestCase):
+    """Class used to test link_checker module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        """Method starting the local media server and preparing the responses database."""
+        MediaHandler.requests = []
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), MediaHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.db_filename = os.path.join(self.work_dir.name, 'responses.db')
+        conn = sqlite3.connect(self.db_filename)
+        conn.execute('CREATE TABLE responses (response text, link text, hero text, '
+                     'hero_id integer, stripped text)')
+        conn.executemany("INSERT INTO responses(response, link, hero, stripped) VALUES (?, ?, ?, ?)",
+                         [("wind's howling", self.url + '/Geralt.mp3', 'Geralt', 'winds howling'),
+                          ("wind's howling", self.url + '/Eredin.mp3', 'Eredin', 'winds howling'),
+                          ("zireael", self.url + '/Ciri.mp3', 'Ciri', 'zireael')])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.work_dir.cleanup()
+
+    def check_links(self, **kwargs):
+        """Method running check_links on the test database."""
+        with mock.patch.dict(properties.GAMES[properties.DEFAULT_GAME],
+                             {'responses_db': self.db_filename}), \
+                mock.patch('builtins.print'):
+            return link_checker.check_links(**kwargs)
+
+    def test_check_links(self):
+        """Method testing check_links method from link_checker module.
+
+        The method checks if the statuses and ETags are cached and the dead links found.
+        """
+        self.assertEqual(self.check_links(workers=2), (3, 1))
+
+        conn = sqlite3.connect(self.db_filename)
+        rows = dict((link[len(self.url):], (status, etag)) for link, status, etag in
+                    conn.execute("SELECT link, status, etag FROM links"))
+        self.assertEqual(rows, {'/Geralt.mp3': (200, '"abc"'), '/Ciri.mp3': (200, '"def"'),
+                                '/Eredin.mp3': (404, None)})
+        self.assertEqual(link_health.load_dead_links(conn.cursor()),
+                         frozenset([self.url + '/Eredin.mp3']))
+        conn.close()
+
+    def test_only_stale_links_rechecked(self):
+        """Method testing that only the stale links are checked again, with conditional requests."""
+        self.check_links()
+        MediaHandler.requests = []
+        self.assertEqual(self.check_links(), (0, 0))
+        self.assertEqual(MediaHandler.requests, [])
+
+        conn = sqlite3.connect(self.db_filename)
+        conn.execute("UPDATE links SET checked=? WHERE link=?",
+                     (datetime.date.today() - datetime.timedelta(days=30), self.url + '/Ciri.mp3'))
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(self.check_links(), (1, 0))
+        self.assertEqual([request[:2] for request in MediaHandler.requests],
+                         [('/Ciri.mp3', '"def"')])
+
+    def test_connection_reuse(self):
+        """Method testing that a single worker sends all the requests over one connection."""
+        self.check_links(workers=1)
+        self.assertEqual(len(MediaHandler.requests), 3)
+        self.assertEqual(len({request[2] for request in MediaHandler.requests}), 1)
+
+    def test_connections_closed(self):
+        """Method testing that the links are checked in batches and the connections of all
+        the workers are closed afterwards."""
+        close = link_checker.HostConnections.close
+        opened = []
+
+        def closing(connections):
+            opened.extend(connections.opened)
+            close(connections)
+
+        with mock.patch.object(link_checker.HostConnections, 'close', autospec=True, side_effect=closing):
+            self.assertEqual(self.check_links(workers=2, batch_size=2), (3, 1))
+        self.assertTrue(opened)
+        self.assertTrue(all(connection.sock is None for connection in opened))
+
+        conn = sqlite3.connect(self.db_filename)
+        self.assertEqual(conn.execute("SELECT count(*) FROM links").fetchone()[0], 3)
+        conn.close()
+
+    def test_dead_links_skipped(self):
+        """Method testing that the loaded responses index skips the responses with dead links."""
+        self.check_links()
+        conn = sqlite3.connect(self.db_filename)
+        conn.execute("UPDATE links SET status=200 WHERE link LIKE '%Eredin.mp3'")
+        conn.execute("UPDATE links SET status=404 WHERE link LIKE '%Geralt.mp3'")
+        index = catalog.ResponseIndex(conn)
+        self.assertEqual(index.find_response("Wind's howling!")[2], 'Eredin')
+
+        conn.execute("UPDATE links SET status=410")
+        index = catalog.ResponseIndex(conn)
+        self.assertIsNone(index.find_response("Wind's howling!"))
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+# coding=UTF-8
+
+"""Module used to test rebuild_jobs module methods."""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+from urllib.error import URLError
+
+from benchmarks import synthetic_data
+from responses_wiki import gwent_wiki_parser as parser
+from responses_wiki import rebuild_jobs
+import gwent_responses_database as database
+import gwent_responses_properties as properties
+
+__author__ = 'Jonarzz'
+
+
+class RebuildJobsTest(unittest.TestCase):
+    """Class used to test rebuild_jobs module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        """Method preparing the wiki pages (a category of 6 pages with 5 responses each)
+        served by the patched page_to_parse and the responses database."""
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.db_filename = os.path.join(self.work_dir.name, 'responses.db')
+        self.pairs = synthetic_data.responses(30)
+        self.endings = ['File:Page_' + str(index) for index in range(6)]
+        self.pages = {}
+        for index, ending in enumerate(self.endings):
+            self.pages[parser.URL_BEGINNING + ending] = synthetic_data.full_media_page(
+                self.pairs[index * 5:index * 5 + 5])
+        self.listing_url = (parser.URL_BEGINNING + parser.URL_START + parser.URL_END + parser.CATEGORY)
+        self.pages[self.listing_url] = synthetic_data.category_listings(self.endings)[0]
+        self.requested = []
+        self.broken = set()
+
+        patches = [mock.patch.dict(properties.GAMES[properties.DEFAULT_GAME], {'responses_db': self.db_filename}),
+                   mock.patch.object(parser, 'page_to_parse', side_effect=self.page_to_parse),
+                   mock.patch.object(parser, 'SCRIPT_DIR', self.work_dir.name),
+                   mock.patch('builtins.print')]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        database.create_responses_database()
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    @staticmethod
+    def keys(pairs):
+        """Method returning the response texts as parsed from the wiki for the (hero, text) pairs."""
+        return {parser.response_text_from_element(synthetic_data.media_element(hero, text)) for hero, text in pairs}
+
+    def page_to_parse(self, url):
+        """Method used instead of page_to_parse, failing for the broken pages."""
+        self.requested.append(url)
+        if url in self.broken:
+            raise URLError("timed out")
+        return self.pages[url]
+
+    def responses(self):
+        """Method returning the sorted (response, page) rows of the responses database."""
+        conn = sqlite3.connect(self.db_filename)
+        rows = conn.execute("SELECT response, page FROM responses ORDER BY response").fetchall()
+        conn.close()
+        return rows
+
+    def test_resume_responses(self):
+        """Method testing that the rebuild of the responses resumes from the first unfinished page
+        without listing the category again or duplicating the saved responses."""
+        self.broken.add(parser.URL_BEGINNING + self.endings[3])
+        with self.assertRaises(URLError):
+            database.add_hero_specific_responses()
+        self.assertEqual(len(self.responses()), 15)
+        self.assertEqual({page for _, page in self.responses()}, set(self.endings[:3]))
+
+        self.broken.clear()
+        self.requested = []
+        database.add_hero_specific_responses()
+        self.assertNotIn(self.listing_url, self.requested)
+        self.assertEqual(sorted(set(self.requested)), [parser.URL_BEGINNING + ending for ending in self.endings[3:]])
+        self.assertEqual(len(self.responses()), 30)
+        self.assertEqual(len(set(self.responses())), 30)
+
+    def test_rerun_changed_pages(self):
+        """Method testing that a new run of a finished job writes only the pages that changed."""
+        database.add_hero_specific_responses()
+        before = self.responses()
+
+        changed = synthetic_data.responses(35)[30:]
+        self.pages[parser.URL_BEGINNING + self.endings[1]] = synthetic_data.full_media_page(changed)
+        self.requested = []
+        connection = sqlite3.connect(self.db_filename)
+        self.assertEqual(rebuild_jobs.RebuildJob(connection, 'responses:' + parser.CATEGORY).status(),
+                         rebuild_jobs.FINISHED)
+        connection.close()
+        database.add_hero_specific_responses()
+
+        self.assertIn(self.listing_url, self.requested)
+        after = self.responses()
+        self.assertEqual(len(after), 30)
+        conn = sqlite3.connect(self.db_filename)
+        self.assertEqual(conn.execute("SELECT max(id) FROM responses").fetchone()[0], 35)
+        conn.close()
+        self.assertEqual(set(before) - set(after), {row for row in before if row[1] == self.endings[1]})
+        self.assertEqual({response for response, page in after if page == self.endings[1]},
+                         self.keys(changed))
+
+    def test_removed_pages(self):
+        """Method testing that the responses of the pages no longer listed in the category and the
+        responses saved before the pages were (without a page) are removed."""
+        conn = sqlite3.connect(self.db_filename)
+        conn.execute("INSERT INTO responses(response, link) VALUES (?, ?)", (sorted(self.keys(self.pairs))[0], "a.mp3"))
+        conn.commit()
+        conn.close()
+        database.add_hero_specific_responses()
+        self.assertEqual(len(self.responses()), 30)
+
+        self.pages[self.listing_url] = synthetic_data.category_listings(self.endings[1:])[0]
+        database.add_hero_specific_responses()
+        self.assertEqual({page for _, page in self.responses()}, set(self.endings[1:]))
+        self.assertEqual(len(self.responses()), 25)
+        conn = sqlite3.connect(self.db_filename)
+        self.assertEqual(conn.execute("SELECT count(*) FROM rebuild_pages").fetchone()[0], 5)
+        conn.close()
+
+    def test_legacy_responses_removed(self):
+        """Method testing that the responses without a page are kept by the migration and by an
+        unfinished rebuild and removed when the rebuild of the category finishes."""
+        conn = sqlite3.connect(self.db_filename)
+        conn.execute("INSERT INTO responses(response, link) VALUES (?, ?)", ("legacy", "a.mp3"))
+        conn.commit()
+        conn.close()
+        database.create_responses_database()
+        self.assertEqual(self.responses(), [("legacy", None)])
+
+        self.broken.add(parser.URL_BEGINNING + self.endings[3])
+        with self.assertRaises(URLError):
+            database.add_hero_specific_responses()
+        self.assertIn(("legacy", None), self.responses())
+        database.add_hero_specific_responses(self.endings[:2])
+        self.assertIn(("legacy", None), self.responses())
+
+        self.broken.clear()
+        database.add_hero_specific_responses()
+        self.assertNotIn(("legacy", None), self.responses())
+        self.assertEqual(len(self.responses()), 30)
+
+    def test_resume_dictionaries(self):
+        """Method testing that the dictionaries are written only when all the pages are parsed
+        and that the next run resumes from the first unfinished page."""
+        self.broken.add(parser.URL_BEGINNING + self.endings[4])
+        with self.assertRaises(URLError):
+            parser.generate_dictionaries('responses.json', 'heroes.json', 'wizard.json')
+        self.assertFalse(os.path.exists(os.path.join(self.work_dir.name, 'responses.json')))
+
+        self.broken.clear()
+        self.requested = []
+        parser.generate_dictionaries('responses.json', 'heroes.json', 'wizard.json')
+        self.assertEqual(sorted(set(self.requested)), [parser.URL_BEGINNING + ending for ending in self.endings[4:]])
+        self.assertEqual(set(parser.dictionary_from_file('responses.json')),
+                         self.keys(self.pairs))
+
+        self.pages[self.listing_url] = synthetic_data.category_listings(self.endings[:5])[0]
+        parser.generate_dictionaries('responses.json', 'heroes.json', 'wizard.json')
+        self.assertEqual(set(parser.dictionary_from_file('responses.json')),
+                         self.keys(self.pairs[:25]))
+        conn = sqlite3.connect(os.path.join(self.work_dir.name, properties.REBUILD_DB_FILENAME))
+        self.assertEqual(conn.execute("SELECT count(DISTINCT ending) FROM rebuild_entries").fetchone()[0], 5)
+        conn.close()
+
+    def test_format_progress(self):
+        """Method testing the progress line with the ETA."""
+        self.assertEqual(rebuild_jobs.format_progress(3, 10, 0, 0), "[3/10] 30.0%")
+        self.assertEqual(rebuild_jobs.format_progress(4, 10, 20, 2), "[4/10] 40.0% ETA 0:01:00")
+        self.assertEqual(rebuild_jobs.format_progress(0, 0, 0, 0), "[0/0] 100.0%")
+
+
+if __name__ == '__main__':
+    unittest.main()
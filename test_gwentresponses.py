@@ -0,0 +1,864 @@
+"""Module used to test gwentresponses module and responses_bot package methods."""
+
+import json
+import multiprocessing
+import sqlite3
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+import unittest
+from unittest import mock
+
+import gwentresponses
+import gwent_responses_backfill as backfill
+import gwent_responses_database as database
+import gwent_responses_properties as properties
+from responses_bot import catalog, dedupe, intake, matcher, profiling, reconcile, records, reply, search, token_cache
+
+__author__ = 'Jonarzz'
+
+
+class FakeComment:
+    """Class used instead of praw Comment, saves the replies, edits and deletions
+    instead of sending them."""
+
+    def __init__(self, comment_id, body, created_utc=0, parent_id='t3_a', subreddit='gwent'):
+        self.id = comment_id
+        self.body = body
+        self.created_utc = created_utc
+        self.parent_id = parent_id
+        self.subreddit = types.SimpleNamespace(display_name=subreddit)
+        self.replies = []
+        self.edits = []
+
+    def reply(self, text):
+        """Method saving the reply text and returning the reply comment."""
+        self.replies.append(text)
+        return FakeComment("r" + self.id, text, self.created_utc, 't1_' + self.id,
+                           self.subreddit.display_name)
+
+    def edit(self, body):
+        """Method saving the new body."""
+        self.edits.append(body)
+        self.body = body
+
+    def delete(self):
+        """Method marking the comment as deleted."""
+        self.body = '[deleted]'
+
+
+class FakeReddit:
+    """Class used instead of praw Reddit, returns the known comments for the info calls
+    (saving the requested fullnames)."""
+
+    def __init__(self, comments):
+        self.comments = {comment.id: comment for comment in comments}
+        self.info_calls = []
+
+    def info(self, fullnames):
+        """Method returning the known comments with the given fullnames."""
+        if len(fullnames) > 100:
+            raise ValueError("Too many fullnames: " + str(len(fullnames)))
+        self.info_calls.append(list(fullnames))
+        return (self.comments[fullname[3:]] for fullname in fullnames if fullname[3:] in self.comments)
+
+
+class FakeAuthorizer:
+    """Class used instead of prawcore Authorizer, counts the token refreshes instead of asking Reddit."""
+
+    def __init__(self, clock=time.time):
+        self.access_token = None
+        self.scopes = None
+        self.refreshes = 0
+        self.clock = clock
+
+    def refresh(self):
+        """Method setting a new token valid for an hour (of the clock)."""
+        self.refreshes += 1
+        self.access_token = "token" + str(self.refreshes) + "-" + str(id(self))
+        self.scopes = {"read", "submit"}
+        self._expiration_timestamp_ns = time.monotonic_ns() + int((self.clock() + 3600 - time.time()) * 10 ** 9)
+
+
+def refresh_in_process(filename):
+    """Method getting the token from the cache in a separate process, appending a line
+    to the refreshes file when the token had to be refreshed."""
+    def refresh():
+        with open(filename + '.refreshes', 'a') as file:
+            file.write("refresh\n")
+        time.sleep(0.2)
+        return "shared", time.time() + 3600, ["read"]
+    return token_cache.TokenCache("key", filename).get(refresh)['access_token']
+
+
+class GwentResponsesTest(unittest.TestCase):
+    """Class used to test gwentresponses module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        """Method preparing in-memory responses and comments databases."""
+        self.connection = sqlite3.connect(':memory:')
+        self.cursor = self.connection.cursor()
+        self.cursor.execute('CREATE TABLE responses (response text, link text, hero text, '
+                            'hero_id integer, stripped text)')
+        dedupe.create_comments_table(self.cursor)
+        self.cursor.execute("INSERT INTO responses(response, link, hero, stripped) VALUES (?, ?, ?, ?)",
+                            ("fancy a game of gwent?", "http://a.a/Geralt.mp3", "Geralt",
+                             matcher.stripped_response("fancy a game of gwent?")))
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_stripped_response(self):
+        """Method testing stripped_response method from matcher module."""
+        self.assertEqual(matcher.stripped_response(" That's a great idea!!! "), "thats a great idea")
+        self.assertEqual(matcher.stripped_response("Wait…"), "wait")
+        self.assertEqual(matcher.stripped_response("How are you?"), "how are you?")
+
+    def test_find_response(self):
+        """Method testing find_response method from matcher module.
+
+        The method checks if the response is found regardless of case and punctuation
+        and if the excluded responses are never matched.
+        """
+        self.cursor.execute("INSERT INTO responses(response, link, stripped) VALUES (?, ?, ?)",
+                            ("thank you", "http://a.a/Ciri.mp3", "thank you"))
+        responses = matcher.load_responses(self.cursor)
+
+        self.assertEqual(matcher.find_response(responses, "Fancy a game of Gwent?!"),
+                         ("fancy a game of gwent?", "http://a.a/Geralt.mp3", "Geralt"))
+        self.assertIsNone(matcher.find_response(responses, "Fancy a game of chess?"))
+        self.assertIsNone(matcher.find_response(responses, "Thank you!"))
+        self.assertEqual(matcher.find_response(responses, "Thank you!", excluded=frozenset())[1],
+                         "http://a.a/Ciri.mp3")
+
+    def test_response_records(self):
+        """Method testing that the loaded response records share the hero names and link prefixes."""
+        factory = records.RecordFactory()
+        first = factory.record("a b", "http://a.a/x/1/Geralt_a.mp3", "".join(["Ger", "alt"]))
+        second = factory.record("c d", "http://a.a/x/1/Geralt_c.mp3", "".join(["Ger", "alt"]))
+
+        self.assertEqual(first.as_tuple(), ("a b", "http://a.a/x/1/Geralt_a.mp3", "Geralt"))
+        self.assertEqual(second.link, "http://a.a/x/1/Geralt_c.mp3")
+        self.assertIs(first.hero, second.hero)
+        self.assertIs(first.link_prefix, second.link_prefix)
+        self.assertFalse(hasattr(first, '__dict__'))
+        self.assertEqual(factory.record("e f", None, None).as_tuple(), ("e f", None, None))
+        self.assertEqual(factory.record("g h", "", None).as_tuple(), ("g h", "", None))
+
+    def test_create_reply(self):
+        """Method testing create_reply method from reply module."""
+        self.assertEqual(reply.create_reply('abc', 'http://def.gh/Abad_a_.mp3', 'Abaddon'),
+                         "[abc](http://def.gh/Abad_a_.mp3) (sound warning: Abaddon)"
+                         + properties.COMMENT_ENDING)
+        self.assertEqual(reply.create_reply('abc', 'http://def.gh/Abad_a_.mp3'),
+                         "[abc](http://def.gh/Abad_a_.mp3)" + properties.COMMENT_ENDING)
+
+    def test_process_comment(self):
+        """Method testing process_comment method from gwentresponses module.
+
+        The method checks if the quoting comment gets a reply exactly once.
+        """
+        comment = FakeComment("c1", "Fancy a game of Gwent?")
+        index = catalog.ResponseIndex(self.connection)
+
+        self.assertTrue(gwentresponses.process_comment(comment, index, self.cursor))
+        self.connection.rollback()
+        self.assertFalse(gwentresponses.process_comment(comment, index, self.cursor))
+        self.assertEqual(comment.replies, [reply.create_reply("Fancy a game of Gwent?",
+                                                              "http://a.a/Geralt.mp3", "Geralt")])
+        self.assertFalse(gwentresponses.process_comment(FakeComment("c2", "no"), index, self.cursor))
+        self.assertEqual(dedupe.recent_replies(self.cursor, 1),
+                         [("c1", "rc1", dedupe.body_hash("Fancy a game of Gwent?"))])
+
+    def test_process_batch_failure(self):
+        """Method testing that a failed reply does not stop the batch and that its comment
+        is not marked as checked."""
+        failing = FakeComment("c1", "Fancy a game of Gwent?")
+        failing.reply = mock.Mock(side_effect=RuntimeError("rate limit"))
+        comment = FakeComment("c2", "Fancy a game of Gwent?")
+        catalogs = mock.Mock(**{'index_for_subreddit.return_value': catalog.ResponseIndex(self.connection)})
+        stats = intake.IntakeStats()
+
+        with mock.patch('builtins.print'):
+            gwentresponses.process_batch([failing, comment], catalogs, self.cursor, stats)
+        self.assertEqual((stats.processed, stats.failed), (1, 1))
+        self.assertFalse(dedupe.is_comment_done(self.cursor, "c1"))
+        self.assertEqual(len(comment.replies), 1)
+        self.assertTrue(dedupe.is_comment_done(self.cursor, "c2"))
+
+    def test_lazy_imports(self):
+        """Method testing that the bot entry point does not import the scraper, Reddit API
+        and profiling dependencies at start."""
+        code = ("import sys, gwentresponses, gwent_responses_database; "
+                "print(sorted({'bs4', 'praw', 'urllib.request', 'responses_wiki.gwent_wiki_parser',"
+                " 'signal', 'socketserver', 'tracemalloc'} & set(sys.modules)))")
+        output = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True)
+        self.assertEqual(output.strip(), '[]')
+
+
+class SearchTest(unittest.TestCase):
+    """Class used to test search module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        """Method preparing in-memory responses database with the search index."""
+        self.connection = sqlite3.connect(':memory:')
+        self.cursor = self.connection.cursor()
+        self.cursor.execute('CREATE TABLE responses (id integer primary key, response text, link text, '
+                            'hero text, hero_id integer, stripped text)')
+        self.cursor.executescript(database.SEARCH_INDEX_SQL)
+        self.cursor.executemany("INSERT INTO responses(response, link, hero, hero_id) VALUES (?, ?, ?, ?)",
+                                [("wind's howling", "http://a.a/1.mp3", "Geralt", 1),
+                                 ("the wild hunt is coming", "http://a.a/2.mp3", "Eredin", 2),
+                                 ("hunt or be hunted", "http://a.a/3.mp3", "Geralt", 1),
+                                 ("fancy a game of gwent?", "http://a.a/4.mp3", "Geralt", 1)])
+
+    def tearDown(self):
+        self.connection.close()
+
+    def found(self, keywords, **kwargs):
+        """Method returning the found response texts."""
+        return [row[0] for row in search.search_responses(self.cursor, keywords, **kwargs)]
+
+    def test_search_responses(self):
+        """Method testing search_responses method from search module.
+
+        The method checks keyword and prefix matching, ranking and the hero filter.
+        """
+        self.assertEqual(self.found("hunted"), ["hunt or be hunted"])
+        self.assertEqual(self.found("HUNT"), ["hunt or be hunted", "the wild hunt is coming"])
+        self.assertEqual(self.found("hun", hero_id=2), ["the wild hunt is coming"])
+        self.assertEqual(self.found("gwen fancy"), ["fancy a game of gwent?"])
+        self.assertEqual(self.found("hunt", limit=1), ["hunt or be hunted"])
+        self.assertEqual(self.found("hunt", dead_links={"http://a.a/3.mp3"}),
+                         ["the wild hunt is coming"])
+        self.assertEqual(self.found("?!"), [])
+        self.assertEqual(self.found("chess"), [])
+
+    def test_index_in_sync(self):
+        """Method testing that the search index follows updates and deletes of the responses."""
+        self.cursor.execute("UPDATE responses SET response='the wild hunt is here' WHERE hero_id=2")
+        self.assertEqual(self.found("coming"), [])
+        self.assertEqual(self.found("here"), ["the wild hunt is here"])
+
+        self.cursor.execute("DELETE FROM responses WHERE hero='Geralt'")
+        self.assertEqual(self.found("hunt"), ["the wild hunt is here"])
+
+    def test_index_after_vacuum(self):
+        """Method testing that a responses table created without the id column is migrated
+        by create_responses_database and that the search index survives VACUUM."""
+        with tempfile.TemporaryDirectory() as work_dir:
+            db_filename = os.path.join(work_dir, 'responses.db')
+            conn = sqlite3.connect(db_filename)
+            conn.execute('CREATE TABLE responses (response text, link text, hero text, '
+                         'hero_id integer, stripped text, page text)')
+            conn.executemany("INSERT INTO responses(response, link, page) VALUES (?, ?, ?)",
+                             [("wind's howling", "http://a.a/1.mp3", "File:A"),
+                              ("hunt or be hunted", "http://a.a/3.mp3", "File:B")])
+            conn.commit()
+            conn.close()
+            with mock.patch.dict(properties.GAMES[properties.DEFAULT_GAME], {'responses_db': db_filename}):
+                database.create_responses_database()
+
+            conn = sqlite3.connect(db_filename)
+            self.assertEqual(conn.execute("SELECT id, response FROM responses ORDER BY id").fetchall(),
+                             [(1, "wind's howling"), (2, "hunt or be hunted")])
+            conn.execute("DELETE FROM responses WHERE id=1")
+            conn.commit()
+            conn.execute("VACUUM")
+            self.assertEqual([row[0] for row in search.search_responses(conn.cursor(), "hunt")],
+                             ["hunt or be hunted"])
+            conn.close()
+
+    def test_index_by_rowid_migrated(self):
+        """Method testing that a responses table without the id column, with the search index
+        keyed on the rowids and its triggers, is migrated to the index keyed on the ids."""
+        with tempfile.TemporaryDirectory() as work_dir:
+            db_filename = os.path.join(work_dir, 'responses.db')
+            conn = sqlite3.connect(db_filename)
+            conn.execute('CREATE TABLE responses (response text, link text, hero text, '
+                         'hero_id integer, stripped text, page text)')
+            conn.executescript(database.SEARCH_INDEX_SQL.replace("content_rowid='id'", "content_rowid='rowid'")
+                               .replace("new.id", "new.rowid").replace("old.id", "old.rowid"))
+            conn.execute("INSERT INTO responses(response, link, page) VALUES (?, ?, ?)",
+                         ("hunt or be hunted", "http://a.a/3.mp3", "File:B"))
+            conn.commit()
+            conn.close()
+            with mock.patch.dict(properties.GAMES[properties.DEFAULT_GAME], {'responses_db': db_filename}):
+                database.create_responses_database()
+
+            conn = sqlite3.connect(db_filename)
+            conn.execute("INSERT INTO responses(response, link, page) VALUES (?, ?, ?)",
+                         ("the wild hunt is coming", "http://a.a/2.mp3", "File:A"))
+            self.assertEqual([row[0] for row in search.search_responses(conn.cursor(), "hunt")],
+                             ["hunt or be hunted", "the wild hunt is coming"])
+            self.assertEqual(conn.execute("SELECT count(*) FROM sqlite_master WHERE type='trigger'").fetchone()[0], 3)
+            conn.close()
+
+    def test_search_command(self):
+        """Method testing search_command method and the reply to the command comment."""
+        command = properties.SEARCH_COMMAND
+        self.assertTrue(search.is_search_command("  " + command.upper() + " hunt"))
+        self.assertFalse(search.is_search_command("hunt " + command))
+        self.assertEqual(len(search.search_command(self.cursor, command + " hunt")), 2)
+        self.assertEqual(search.search_command(self.cursor, command + " eredin: hunt"),
+                         [("the wild hunt is coming", "http://a.a/2.mp3", "Eredin")])
+        self.assertEqual(search.search_command(self.cursor, command + " ciri: hunt"), [])
+
+        dedupe.create_comments_table(self.cursor)
+        comment = FakeComment("c1", command + " wind")
+        index = catalog.ResponseIndex(self.connection)
+        self.assertTrue(gwentresponses.process_comment(comment, index, self.cursor))
+        self.assertEqual(comment.replies, ["* [wind's howling](http://a.a/1.mp3) (Geralt)\n"
+                                           + properties.COMMENT_ENDING])
+
+
+class CatalogsTest(unittest.TestCase):
+    """Class used to test catalog module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        """Method preparing a responses database for each of three games and a fake clock."""
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.now = 0
+        self.games = {}
+        for game in ('gwent', 'dota2', 'artifact'):
+            db_filename = os.path.join(self.work_dir.name, game + '.db')
+            conn = sqlite3.connect(db_filename)
+            conn.execute('CREATE TABLE responses (response text, link text, hero text, '
+                         'hero_id integer, stripped text)')
+            conn.executemany("INSERT INTO responses(response, link, stripped) VALUES (?, ?, ?)",
+                             [("hello " + game, game + ".mp3", "hello " + game),
+                              ("black king bar", game + "-bkb.mp3", "black king bar")])
+            conn.commit()
+            conn.close()
+            self.games[game] = {'wiki_url': 'http://' + game, 'category': 'Audio',
+                                'responses_db': db_filename, 'subreddits': [game.upper()],
+                                'excluded_responses': ['black king bar'] if game == 'dota2' else []}
+        self.catalogs = catalog.Catalogs(self.games, max_loaded=2, max_idle=60,
+                                         clock=lambda: self.now)
+
+    def tearDown(self):
+        self.catalogs.close()
+        self.work_dir.cleanup()
+
+    def test_index_for_subreddit(self):
+        """Method testing that the indexes are loaded on first use for the game of the subreddit
+        with the game's excluded responses."""
+        self.assertEqual(self.catalogs.subreddits(), ['artifact', 'dota2', 'gwent'])
+        self.assertEqual(self.catalogs.loaded(), [])
+        self.assertIsNone(self.catalogs.index_for_subreddit('AskReddit'))
+
+        gwent = self.catalogs.index_for_subreddit('Gwent')
+        self.assertEqual(gwent.find_response("Hello gwent!")[1], "gwent.mp3")
+        self.assertIsNone(gwent.find_response("Hello dota2"))
+        self.assertEqual(gwent.find_response("Black King Bar")[1], "gwent-bkb.mp3")
+        self.assertIs(self.catalogs.index_for_subreddit('gwent'), gwent)
+
+        dota = self.catalogs.index_for_subreddit('dota2')
+        self.assertIsNone(dota.find_response("Black King Bar"))
+        self.assertEqual([c.name for c in self.catalogs.loaded()], ['gwent', 'dota2'])
+
+    def test_eviction(self):
+        """Method testing that the least recently used index is evicted above max_loaded
+        and that the idle indexes are evicted."""
+        self.catalogs.index_for_subreddit('gwent')
+        self.now = 10
+        self.catalogs.index_for_subreddit('dota2')
+        self.now = 20
+        self.catalogs.index_for_subreddit('gwent')
+        self.now = 30
+        self.catalogs.index_for_subreddit('artifact')
+        self.assertEqual([c.name for c in self.catalogs.loaded()], ['gwent', 'artifact'])
+
+        self.now = 85
+        self.catalogs.evict_idle()
+        self.assertEqual([c.name for c in self.catalogs.loaded()], ['artifact'])
+        self.now = 100
+        self.catalogs.evict_idle()
+        self.assertEqual(self.catalogs.loaded(), [])
+
+    def test_unavailable_database(self):
+        """Method testing that a game with a missing or not built responses database is reported
+        once and dropped (the database is opened read-only, so it is not created)."""
+        missing = os.path.join(self.work_dir.name, 'missing.db')
+        unbuilt = os.path.join(self.work_dir.name, 'unbuilt.db')
+        sqlite3.connect(unbuilt).close()
+        games = dict(self.games)
+        games['missing'] = dict(self.games['gwent'], responses_db=missing, subreddits=['Missing'])
+        games['unbuilt'] = dict(self.games['gwent'], responses_db=unbuilt, subreddits=['Unbuilt'])
+        catalogs = catalog.Catalogs(games, clock=lambda: self.now)
+        self.addCleanup(catalogs.close)
+
+        with mock.patch('builtins.print') as print_mock:
+            for _ in range(2):
+                self.assertIsNone(catalogs.index_for_subreddit('missing'))
+                self.assertIsNone(catalogs.index_for_subreddit('unbuilt'))
+        self.assertEqual(print_mock.call_count, 2)
+        self.assertFalse(os.path.exists(missing))
+        self.assertEqual(catalogs.subreddits(), ['artifact', 'dota2', 'gwent'])
+        self.assertEqual(catalogs.index_for_subreddit('gwent').find_response("hello gwent")[1], "gwent.mp3")
+
+    def test_limits(self):
+        """Method testing that max_idle set to 0 is not replaced by the default
+        and that max_loaded must be at least 1."""
+        catalogs = catalog.Catalogs(self.games, max_loaded=1, max_idle=0, clock=lambda: self.now)
+        self.assertEqual((catalogs.max_loaded, catalogs.max_idle), (1, 0))
+        catalogs.index_for_subreddit('gwent')
+        catalogs.index_for_subreddit('dota2')
+        self.assertEqual([c.name for c in catalogs.loaded()], ['dota2'])
+        self.now = 1
+        catalogs.evict_idle()
+        self.assertEqual(catalogs.loaded(), [])
+        with self.assertRaises(ValueError):
+            catalog.Catalogs(self.games, max_loaded=0)
+
+
+class IntakeTest(unittest.TestCase):
+    """Class used to test intake module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        """Method preparing an intake queue of 3 comments with 100 seconds age budget."""
+        self.now = 1000
+        self.queue = intake.IntakeQueue(max_size=3, max_age=100, top_level_bonus=30,
+                                        clock=lambda: self.now)
+
+    def ids(self, batch):
+        """Method returning the ids of the comments in the batch."""
+        return [comment.id for comment in batch]
+
+    def test_priority(self):
+        """Method testing that fresh and top-level comments are processed first."""
+        self.queue.push(FakeComment("old-reply", "", 950, 't1_x'))
+        self.queue.push(FakeComment("old-top", "", 950))
+        self.queue.push(FakeComment("new-reply", "", 970, 't1_x'))
+
+        self.assertEqual(self.ids(self.queue.pop_batch(10)), ["old-top", "new-reply", "old-reply"])
+
+    def test_shedding(self):
+        """Method testing that too old, overflowing and expired comments are shed and counted."""
+        self.assertFalse(self.queue.push(FakeComment("too-old", "", 850)))
+        for created_utc in (910, 920, 930):
+            self.assertTrue(self.queue.push(FakeComment(str(created_utc), "", created_utc, 't1_x')))
+        self.assertFalse(self.queue.push(FakeComment("older", "", 905, 't1_x')))
+        self.assertTrue(self.queue.push(FakeComment("newer", "", 990, 't1_x')))
+
+        self.now = 1025
+        self.assertEqual(self.ids(self.queue.pop_batch(10)), ["newer", "930"])
+        self.assertEqual(self.queue.stats.as_dict(),
+                         {"received": 6, "processed": 0, "failed": 0, "shed": 4, "shed_too_old": 1,
+                          "shed_overflow": 2, "shed_expired": 1, "queued": 0,
+                          "lag": 0.0, "max_lag": 0.0})
+
+        self.queue.stats.record_processed(FakeComment("x", "", 990), self.now)
+        self.assertEqual(self.queue.stats.lag, 35)
+        self.assertEqual(self.queue.pop_batch(10, timeout=0), [])
+
+    def test_batch_sizer(self):
+        """Method testing that the batch size grows while the batches are fast enough
+        and is halved when they are too slow."""
+        sizer = intake.BatchSizer(minimum=1, maximum=20, target_seconds=1.0)
+        sizes = [sizer.update(sizer.size, 0.1) for _ in range(10)]
+        self.assertEqual(sizes, [2, 3, 4, 5, 6, 7, 8, 10, 12, 15])
+        self.assertEqual(sizer.update(3, 0.1), 15)
+        self.assertEqual(sizer.update(15, 2.0), 7)
+        self.assertEqual(sizer.update(7, 5.0), 3)
+
+
+class BackfillTest(unittest.TestCase):
+    """Class used to test gwent_responses_backfill module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        """Method preparing a responses database and a dump file with served, other
+        and broken comments."""
+        self.work_dir = tempfile.TemporaryDirectory()
+        db_filename = os.path.join(self.work_dir.name, 'gwent.db')
+        conn = sqlite3.connect(db_filename)
+        conn.execute('CREATE TABLE responses (response text, link text, hero text, '
+                     'hero_id integer, stripped text)')
+        conn.execute("INSERT INTO responses(response, link, hero, stripped) VALUES (?, ?, ?, ?)",
+                     ("fancy a game of gwent?", "geralt.mp3", "Geralt",
+                      matcher.stripped_response("Fancy a game of Gwent?")))
+        conn.commit()
+        conn.close()
+        self.games = {'gwent': {'wiki_url': 'http://gwent', 'category': 'Audio',
+                                'responses_db': db_filename, 'subreddits': ['gwent'],
+                                'excluded_responses': []}}
+
+        self.dump = os.path.join(self.work_dir.name, 'dump.ndjson')
+        with open(self.dump, 'w') as file:
+            for number in range(300):
+                body = "Fancy a game of Gwent?" if number % 3 == 0 else "Something else " + str(number)
+                subreddit = 'Gwent' if number % 2 == 0 else 'AskReddit'
+                file.write(json.dumps({"id": str(number), "subreddit": subreddit, "body": body,
+                                       "created_utc": number}) + "\n")
+            file.write('{"id": "broken", "subreddit": "gwent", \n\n')
+            file.write('{"id": "other", "subreddit": "AskReddit", \n')
+            file.write(json.dumps({"id": "deleted", "subreddit": "gwent", "body": "[deleted]"}))
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def test_chunk_ranges(self):
+        """Method testing that the chunks cover the whole file and end at line boundaries."""
+        size = os.path.getsize(self.dump)
+        with open(self.dump, 'rb') as file:
+            data = file.read()
+        for chunks in (1, 2, 7, 1000):
+            ranges = backfill.chunk_ranges(self.dump, chunks)
+            self.assertLessEqual(len(ranges), chunks)
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], size)
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, start)
+                self.assertEqual(data[end - 1:end], b"\n")
+
+        open(self.dump, 'w').close()
+        self.assertEqual(backfill.chunk_ranges(self.dump, 4), [])
+
+    def test_block_ranges(self):
+        """Method testing that the blocks cover the byte range and end at line boundaries."""
+        data = b"a\nbb\nccc\ndddd\n"
+        self.assertEqual(backfill.block_ranges(data, 0, len(data), 3), [(0, 5), (5, 9), (9, 14)])
+        self.assertEqual(backfill.block_ranges(data, 2, 9, 100), [(2, 9)])
+        self.assertEqual(backfill.block_ranges(data, 5, 5, 3), [])
+
+    def test_backfill(self):
+        """Method testing that the candidate replies and the statistics of the run are saved."""
+        output = os.path.join(self.work_dir.name, 'backfill.db')
+        with mock.patch('builtins.print'):
+            for workers in (1, 3):
+                run_id, counters = backfill.backfill(self.dump, workers, output, self.games)
+
+        self.assertEqual(run_id, 2)
+        self.assertEqual(counters['lines'], 303)
+        self.assertEqual(counters['errors'], 1)
+        self.assertEqual(counters['comments', 'gwent'], 151)
+        self.assertEqual(counters['matched', 'gwent'], 50)
+
+        conn = sqlite3.connect(output)
+        self.assertEqual(conn.execute("SELECT lines, comments, matched, errors FROM backfill_runs").fetchall(),
+                         [(303, 151, 50, 1)] * 2)
+        self.assertEqual(conn.execute("SELECT * FROM backfill_games WHERE run_id=2").fetchall(),
+                         [(2, 'gwent', 151, 50)])
+        candidates = conn.execute("SELECT comment_id, game, response, link, hero FROM backfill_candidates "
+                                  "WHERE run_id=2 ORDER BY created_utc").fetchall()
+        conn.close()
+        self.assertEqual(len(candidates), 50)
+        self.assertEqual(candidates[1], ("6", "gwent", "fancy a game of gwent?", "geralt.mp3", "Geralt"))
+
+    def test_backfill_missing_database(self):
+        """Method testing that a game whose responses database is missing is dropped
+        (as in the live bot) and the other games are still matched."""
+        with open(self.dump, 'a') as file:
+            file.write("\n" + json.dumps({"id": "a1", "subreddit": "AskReddit", "body": "Fancy a game of Gwent?"}))
+        self.games['askreddit'] = dict(self.games['gwent'], subreddits=['AskReddit'],
+                                       responses_db=os.path.join(self.work_dir.name, 'missing.db'))
+        with mock.patch('builtins.print'):
+            _, counters = backfill.backfill(self.dump, 2, os.path.join(self.work_dir.name, 'backfill.db'), self.games)
+
+        self.assertEqual(counters['matched', 'gwent'], 50)
+        self.assertEqual(counters['comments', 'askreddit'], 0)
+        self.assertFalse(os.path.exists(os.path.join(self.work_dir.name, 'missing.db')))
+
+
+class TokenCacheTest(unittest.TestCase):
+    """Class used to test token_cache module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.work_dir.name, 'token.json')
+        self.now = time.time()
+
+    def tearDown(self):
+        self.work_dir.cleanup()
+
+    def clock(self):
+        """Method returning the fake time."""
+        return self.now
+
+    def cache(self, key="key"):
+        """Method returning a token cache of the test file with a fake clock."""
+        return token_cache.TokenCache(key, self.filename, margin=300, clock=self.clock)
+
+    def test_shared_token(self):
+        """Method testing that the token refreshed by one authorizer is used by the others,
+        refreshed before it expires and after it is rejected."""
+        first = token_cache.use_token_cache(FakeAuthorizer(self.clock), self.cache())
+        second = token_cache.use_token_cache(FakeAuthorizer(self.clock), self.cache())
+        other_account = token_cache.use_token_cache(FakeAuthorizer(self.clock), self.cache("other"))
+
+        self.assertFalse(first.is_valid())
+        first.refresh()
+        second.refresh()
+        other_account.refresh()
+        self.assertTrue(first.is_valid() and second.is_valid())
+        self.assertEqual((first.refreshes, second.refreshes, other_account.refreshes), (1, 0, 1))
+        self.assertEqual(second.access_token, first.access_token)
+        self.assertEqual(second.scopes, {"read", "submit"})
+        self.assertEqual(os.stat(self.filename).st_mode & 0o777, 0o600)
+
+        self.now += 3600 - 200
+        self.assertFalse(second.is_valid())
+        second.refresh()
+        first.refresh()
+        self.assertEqual((first.refreshes, second.refreshes), (1, 1))
+        self.assertEqual(first.access_token, second.access_token)
+
+        token = first.access_token
+        first.access_token = None
+        first.refresh()
+        self.assertEqual(first.refreshes, 2)
+        self.assertNotEqual(first.access_token, token)
+
+    def test_refresh_in_processes(self):
+        """Method testing that the processes needing a token at the same time refresh it once."""
+        with multiprocessing.Pool(4) as pool:
+            tokens = pool.map(refresh_in_process, [self.filename] * 4)
+        self.assertEqual(tokens, ["shared"] * 4)
+        with open(self.filename + '.refreshes') as file:
+            self.assertEqual(file.read(), "refresh\n")
+
+        with open(self.filename, 'w') as file:
+            file.write("{broken")
+        self.assertIsNone(self.cache().load())
+
+
+class ProfilingTest(unittest.TestCase):
+    """Class used to test profiling module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.profiler = profiling.Profiler(self.work_dir.name, interval=0.001)
+
+    def tearDown(self):
+        self.profiler.stop()
+        self.profiler.wait()
+        self.work_dir.cleanup()
+
+    def stage_shares(self, filename):
+        """Method returning the share (percent) of every stage in the report file."""
+        with open(filename) as file:
+            lines = file.read().split("\n\n")[1].splitlines()[1:]
+        return {line.split()[0]: float(line.split()[2].rstrip('%')) for line in lines}
+
+    def reports(self, kind):
+        """Method returning the number of the report files of the kind of profile."""
+        return len([name for name in os.listdir(self.work_dir.name) if name.startswith(kind)])
+
+    def wait_for_reports(self, kind, count):
+        """Method waiting (up to 5 seconds) for the report files of a profile started by a signal."""
+        deadline = time.monotonic() + 5
+        while self.reports(kind) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_stage_of(self):
+        """Method testing that the innermost frame matching a rule gives the stage."""
+        self.assertEqual(profiling.stage_of([('gwentresponses', 'read_comments'), ('prawcore.sessions', 'request'),
+                                             ('praw.objector', 'objectify')]), 'parse')
+        self.assertEqual(profiling.stage_of([('gwentresponses', 'read_comments'), ('ssl', 'read')]), 'fetch')
+        self.assertEqual(profiling.stage_of([('gwentresponses', 'process_comment'),
+                                             ('responses_bot.dedupe', 'is_comment_done')]), 'dedupe')
+        self.assertEqual(profiling.stage_of([('gwentresponses', None)]), 'other')
+        self.assertEqual(profiling.stage_of([('responses_bot.matcherx', 'find')]), 'other')
+
+    @staticmethod
+    def fake_frame(*stack):
+        """Method returning the innermost of fake frames with the (module, function) stack."""
+        frame = None
+        for module, function in stack:
+            frame = types.SimpleNamespace(f_globals={'__name__': module}, f_back=frame,
+                                          f_code=types.SimpleNamespace(co_name=function))
+        return frame
+
+    def test_cpu_profile(self):
+        """Method testing that the sampled stacks are reported in the stages they match
+        (with the stacks sampled from fake frames of two threads, so the shares are exact)."""
+        frames = {-1: self.fake_frame(('gwentresponses', 'process_comment'),
+                                      ('responses_bot.matcher', 'find_response')),
+                  -2: self.fake_frame(('gwentresponses', 'read_comments'), ('threading', 'wait'))}
+        with mock.patch.object(profiling.sys, '_current_frames', return_value=frames):
+            filename = self.profiler.start('cpu', 0.05)
+            self.assertIsNone(self.profiler.start('memory', 1))
+            self.profiler.wait()
+
+        shares = self.stage_shares(filename)
+        self.assertEqual(set(shares), set(profiling.STAGES))
+        self.assertEqual((shares['match'], shares['idle'], shares['other']), (50.0, 50.0, 0.0))
+        with open(os.path.splitext(filename)[0] + '.folded') as file:
+            self.assertIn("match;gwentresponses:process_comment;responses_bot.matcher:find_response ", file.read())
+
+    def test_memory_profile(self):
+        """Method testing that the memory allocated by the loaded responses is reported
+        in the match stage."""
+        connection = sqlite3.connect(':memory:')
+        connection.execute('CREATE TABLE responses (response text, link text, hero text, '
+                           'hero_id integer, stripped text)')
+        connection.executemany("INSERT INTO responses(response, link, hero, stripped) VALUES (?, ?, ?, ?)",
+                               [("response " + str(number), "http://a.a/" + str(number) + ".mp3",
+                                 "Hero " + str(number % 10), "response " + str(number)) for number in range(5000)])
+
+        filename = self.profiler.start('memory', 1)
+        time.sleep(0.1)
+        responses = matcher.load_responses(connection.cursor())
+        self.profiler.stop()
+        self.profiler.wait()
+
+        self.assertEqual(len(responses), 5000)
+        self.assertGreater(self.stage_shares(filename)['match'], 50)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_triggers(self):
+        """Method testing that the profiles are started by the signals and the admin socket commands."""
+        path = os.path.join(self.work_dir.name, 'admin.sock')
+        server = profiling.start_admin_socket(self.profiler, path)
+
+        def send(command):
+            with socket.socket(socket.AF_UNIX) as client:
+                client.connect(path)
+                client.sendall(command.encode('UTF-8') + b"\n")
+                return client.makefile().readline().strip()
+
+        try:
+            self.assertEqual(send("memory 5").split()[0], "started")
+            self.assertEqual(send("cpu"), "busy")
+            self.assertEqual(send("stop"), "stopped")
+            self.profiler.wait()
+            self.assertTrue(send("cpu 0.1").endswith(".txt"))
+            self.assertTrue(send("hello").startswith("unknown command"))
+            self.assertTrue(send("cpu soon").startswith("error"))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.profiler.wait()
+
+        handlers = signal.getsignal(signal.SIGUSR1), signal.getsignal(signal.SIGUSR2)
+        try:
+            profiling.install_signal_handlers(self.profiler)
+            with mock.patch.object(properties, 'PROFILE_SECONDS', 0.1):
+                os.kill(os.getpid(), signal.SIGUSR1)
+                self.wait_for_reports('cpu', 4)
+        finally:
+            signal.signal(signal.SIGUSR1, handlers[0])
+            signal.signal(signal.SIGUSR2, handlers[1])
+        self.assertEqual(self.reports('cpu'), 4)
+
+    def test_signal_profile_error(self):
+        """Method testing that a profile failing to start (e.g. the reports directory can not be
+        created) is reported and the following signals still start the profiles."""
+        handlers = signal.getsignal(signal.SIGUSR1), signal.getsignal(signal.SIGUSR2)
+        try:
+            profiling.install_signal_handlers(self.profiler)
+            with mock.patch.object(properties, 'PROFILE_SECONDS', 0.1), mock.patch('builtins.print') as print_mock:
+                with mock.patch.object(profiling.os, 'makedirs', side_effect=PermissionError("denied")):
+                    os.kill(os.getpid(), signal.SIGUSR1)
+                    deadline = time.monotonic() + 5
+                    while not print_mock.called and time.monotonic() < deadline:
+                        time.sleep(0.01)
+                os.kill(os.getpid(), signal.SIGUSR1)
+                self.wait_for_reports('cpu', 2)
+        finally:
+            signal.signal(signal.SIGUSR1, handlers[0])
+            signal.signal(signal.SIGUSR2, handlers[1])
+        self.assertIn("PROFILE ERROR", print_mock.call_args_list[0][0][0])
+        self.assertEqual(self.reports('cpu'), 2)
+
+    def test_signal_handler_with_lock_held(self):
+        """Method testing that the signal handler does not take the profiler's lock
+        (held by the interrupted main thread), the profile is started once the lock is released."""
+        handlers = signal.getsignal(signal.SIGUSR1), signal.getsignal(signal.SIGUSR2)
+        try:
+            profiling.install_signal_handlers(self.profiler)
+            with mock.patch.object(properties, 'PROFILE_SECONDS', 0.1):
+                with self.profiler._lock:
+                    os.kill(os.getpid(), signal.SIGUSR2)
+                    time.sleep(0.05)
+                    self.assertFalse(self.profiler.running)
+                self.wait_for_reports('memory', 1)
+        finally:
+            signal.signal(signal.SIGUSR1, handlers[0])
+            signal.signal(signal.SIGUSR2, handlers[1])
+        self.assertEqual(self.reports('memory'), 1)
+
+
+
+class ReconcileTest(unittest.TestCase):
+    """Class used to test reconcile module.
+    Inherits from TestCase class of unittest module."""
+
+    def setUp(self):
+        """Method preparing the responses database, 250 replied comments on a fake Reddit
+        and the comments database with their replies."""
+        self.work_dir = tempfile.TemporaryDirectory()
+        db_filename = os.path.join(self.work_dir.name, 'gwent.db')
+        conn = sqlite3.connect(db_filename)
+        conn.execute('CREATE TABLE responses (response text, link text, hero text, '
+                     'hero_id integer, stripped text)')
+        conn.executemany("INSERT INTO responses(response, link, hero, stripped) VALUES (?, ?, ?, ?)",
+                         [("fancy a game of gwent?", "http://a.a/Geralt.mp3", "Geralt",
+                           matcher.stripped_response("fancy a game of gwent?")),
+                          ("wind's howling", "http://a.a/Geralt2.mp3", "Geralt",
+                           matcher.stripped_response("wind's howling"))])
+        conn.commit()
+        conn.close()
+        self.catalogs = catalog.Catalogs({'gwent': {'wiki_url': '', 'category': '', 'responses_db': db_filename,
+                                                    'subreddits': ['gwent'], 'excluded_responses': []}})
+
+        self.comments_connection = sqlite3.connect(':memory:')
+        self.cursor = self.comments_connection.cursor()
+        self.cursor.execute('CREATE TABLE comments (id text, date date)')
+        dedupe.create_comments_table(self.cursor)
+
+        self.comments = [FakeComment("c" + str(number), "Fancy a game of Gwent?") for number in range(250)]
+        replies = [gwentresponses.process_comment(comment, self.catalogs.index_for_subreddit('gwent'), self.cursor)
+                   for comment in self.comments]
+        self.assertTrue(all(replies))
+        self.replies = {comment.id: FakeComment("r" + comment.id, comment.replies[0]) for comment in self.comments}
+        self.reddit = FakeReddit(self.comments + list(self.replies.values()))
+
+    def tearDown(self):
+        self.catalogs.close()
+        self.work_dir.cleanup()
+
+    def test_reconcile(self):
+        """Method testing that the replies to the edited and deleted comments are edited or deleted
+        and that only the replies to the changed comments are fetched."""
+        self.comments[0].body = "Wind's howling!"
+        self.comments[1].body = "Fancy a game of chess?"
+        self.comments[2].body = "[deleted]"
+        self.replies["c3"].body = "[removed]"
+        self.comments[3].body = "Wind's howling!"
+        self.comments[4].body = "Fancy a game of Gwent?  "
+        del self.reddit.comments["c5"]
+
+        actions = reconcile.reconcile(self.reddit, self.cursor, self.catalogs)
+        self.assertEqual([len(call) for call in self.reddit.info_calls], [100, 100, 50, 6])
+        self.assertEqual(self.reddit.info_calls[3], ["t1_rc0", "t1_rc1", "t1_rc2", "t1_rc3", "t1_rc4", "t1_rc5"])
+        self.assertEqual([(action.kind, action.comment_id) for action in actions],
+                         [(reconcile.EDIT, "c0"), (reconcile.DELETE, "c1"), (reconcile.DELETE, "c2"),
+                          (reconcile.DELETE, "c5")])
+
+        self.assertEqual(reconcile.apply_actions(self.cursor, actions), 4)
+        self.assertEqual(self.replies["c0"].edits, [reply.create_reply("Wind's howling!", "http://a.a/Geralt2.mp3",
+                                                                       "Geralt")])
+        self.assertEqual([self.replies[comment_id].body for comment_id in ("c1", "c2", "c5")], ["[deleted]"] * 3)
+        self.assertEqual(len(dedupe.recent_replies(self.cursor, 1)), 246)
+
+        self.reddit.info_calls = []
+        self.assertEqual(reconcile.reconcile(self.reddit, self.cursor, self.catalogs), [])
+        self.assertEqual([len(call) for call in self.reddit.info_calls], [100, 100, 46])
+
+
+if __name__ == '__main__':
+    unittest.main()